@@ -1,2 +1,9 @@
 from .simple_traj_game import Game
 from .data_cls import Answer, Attributes, AnsEval
+from .collision import HitEngine
+from .eval_cache import EvalCache
+from .game_batch import GameBatch, BatchEval
+from .scenario_bank import ScenarioBank, ScenarioCfg, generate_scenarios, sample_attributes
+from .parallel_eval import ParallelEvaluator
+from .planner import plan_traj, plan_answer, plan_bank
+from .rollout import collect_rollouts, LineOffsetPolicy
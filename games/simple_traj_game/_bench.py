@@ -0,0 +1,93 @@
+import sys
+sys.path.append("../..")
+import time
+import tempfile
+
+import numpy as np
+
+import games.simple_traj_game as traj_game
+from games.simple_traj_game.collision import calc_hit_masks
+from games.simple_traj_game.spatial_index import ObstacleGrid, calc_hit_pairs
+
+
+NUM_OBSTACLES = [5, 50, 200, 800]
+TRAJ_LENS = [10, 100, 1000, 5000]
+PLANNER_NUM_OBSTACLES = [5, 10, 20, 40]
+PLANNER_NUM_MAPS = 500
+
+
+def random_attr(num_obs: int, rng: np.random.Generator) -> traj_game.Attributes:
+    # keep total obstacle area roughly constant so dense maps stay navigable
+    width_scale = (5 / num_obs) ** 0.5
+    return traj_game.Attributes(
+        map_size=(1.0, 1.0),
+        self_radius=0.03 * min(1.0, width_scale * 2),
+        obstacles=[traj_game.data_cls.SquareObstacle(
+            center_xy=tuple(rng.uniform(0.0, 1.0, 2).tolist()),
+            width=float(rng.uniform(0.05, 0.15) * width_scale),
+            angle=float(rng.random()),
+        ) for _ in range(num_obs)],
+        start_xy=(0.0, 0.0),
+        target_xy=(1.0, 1.0),
+    )
+
+
+def random_walk(traj_len: int, rng: np.random.Generator) -> np.ndarray:
+    steps = rng.normal(0.0, 1.5 / traj_len, (traj_len, 2)) + 1.0 / traj_len
+    return np.cumsum(steps, axis=0)
+
+
+def timeit(fn, min_dur: float = 0.2) -> float:
+    fn()
+    n = 0
+    st = time.perf_counter()
+    while (n == 0) or (time.perf_counter() - st) < min_dur:
+        fn()
+        n += 1
+    return (time.perf_counter() - st) / n
+
+
+def bench_collision():
+    rng = np.random.default_rng(0)
+    print(f"{'obstacles':>9} {'traj_len':>8} {'dense(ms)':>10} {'grid(ms)':>10} {'evaluate_ans(ms)':>17}")
+    for num_obs in NUM_OBSTACLES:
+        attr = random_attr(num_obs, rng)
+        game = traj_game.Game(attr=attr)
+        obs_arrs = game._get_obs_arrs()
+        grid = ObstacleGrid(obs_arrs)
+        for traj_len in TRAJ_LENS:
+            traj = random_walk(traj_len, rng)
+            game.apply_answer(traj_game.Answer(traj))
+
+            def evaluate():
+                game.ans.clear_hit_caches()  # measure the evaluation, not the cache
+                game.evaluate_ans()
+
+            dur_dense = timeit(lambda: calc_hit_masks(traj, attr.self_radius, obs_arrs))
+            dur_grid = timeit(lambda: calc_hit_pairs(traj, attr.self_radius, obs_arrs, grid))
+            dur_eval = timeit(evaluate)
+            print(f"{num_obs:>9} {traj_len:>8} {dur_dense*1e3:>10.3f} {dur_grid*1e3:>10.3f} {dur_eval*1e3:>17.3f}")
+
+
+def bench_planner():
+    print(f"{'obstacles':>9} {'maps/s':>10} {'solved':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for num_obs in PLANNER_NUM_OBSTACLES:
+            bank_dir = f"{tmp_dir}/{num_obs}"
+            cfg = traj_game.ScenarioCfg(num_obstacles=(num_obs, num_obs))
+            traj_game.generate_scenarios(bank_dir, PLANNER_NUM_MAPS, seed=0, cfg=cfg)
+            bank = traj_game.ScenarioBank(bank_dir)
+            st = time.perf_counter()
+            trajs = traj_game.plan_bank(bank, range(len(bank)), num_workers=1)
+            dur = time.perf_counter() - st
+            solved = sum(traj is not None for traj in trajs) / len(trajs)
+            print(f"{num_obs:>9} {len(bank) / dur:>10.1f} {solved:>7.1%}")
+
+
+def main():
+    bench_collision()
+    bench_planner()
+
+
+if __name__ == "__main__":
+    main()
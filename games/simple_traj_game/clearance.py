@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .collision import ObstacleArrays, to_local
+
+from typing import Tuple
+
+
+@dataclass
+class ClearanceField:
+    '''
+    Signed distance to the obstacles sampled on the nodes of a regular grid covering the map.
+    Positive outside obstacles, negative inside. Queries outside the map are clamped to its border.
+    '''
+    sdf: np.ndarray  # (ny + 1, nx + 1), sdf[j, i] is at origin + (i * cell_size[0], j * cell_size[1])
+    origin: np.ndarray  # (2,)
+    cell_size: np.ndarray  # (2,)
+    resolution: int
+
+    def _locate(self, xy: np.ndarray):
+        xy = np.asarray(xy, dtype=np.float64)
+        n_cells = np.array(self.sdf.shape[::-1]) - 1
+        f = np.clip((xy - self.origin) / self.cell_size, 0.0, n_cells)
+        i = np.minimum(f.astype(np.int64), n_cells - 1)
+        t = f - i
+        ix, iy = i[..., 0], i[..., 1]
+        return (
+            self.sdf[iy, ix], self.sdf[iy, ix + 1], self.sdf[iy + 1, ix], self.sdf[iy + 1, ix + 1],
+            t[..., 0], t[..., 1],
+        )
+
+    def query(self, xy: np.ndarray) -> np.ndarray:
+        '''
+        @param: xy
+            (..., 2)
+        @return: (...,) bilinearly interpolated signed distance
+        '''
+        v00, v10, v01, v11, tx, ty = self._locate(xy)
+        return (v00 * (1 - tx) + v10 * tx) * (1 - ty) + (v01 * (1 - tx) + v11 * tx) * ty
+
+    def grad(self, xy: np.ndarray) -> np.ndarray:
+        '''
+        @param: xy
+            (..., 2)
+        @return: (..., 2) gradient of the bilinear interpolant
+        '''
+        v00, v10, v01, v11, tx, ty = self._locate(xy)
+        gx = ((v10 - v00) * (1 - ty) + (v11 - v01) * ty) / self.cell_size[0]
+        gy = ((v01 - v00) * (1 - tx) + (v11 - v10) * tx) / self.cell_size[1]
+        return np.stack([gx, gy], axis=-1)
+
+
+def square_sdf(xy: np.ndarray, centers: np.ndarray, half_widths: np.ndarray, cos_sin: np.ndarray) -> np.ndarray:
+    '''
+    Exact signed distance to each square; broadcasts like `collision.disc_square_hits`.
+    '''
+    lx, ly = to_local(xy, centers, cos_sin)
+    qx = np.abs(lx) - half_widths
+    qy = np.abs(ly) - half_widths
+    return np.hypot(np.maximum(qx, 0.0), np.maximum(qy, 0.0)) + np.minimum(np.maximum(qx, qy), 0.0)
+
+
+def build_clearance_field(obs: ObstacleArrays, map_size: Tuple[float, float], resolution: int) -> ClearanceField:
+    '''
+    The union's distance is the min over squares: exact outside, and a lower bound of the depth where squares overlap.
+    @param: resolution
+        cells along the longer side of the map
+    '''
+    map_w, map_h = map_size
+    cell = max(map_w, map_h) / resolution
+    nx = max(int(np.ceil(map_w / cell)), 1)
+    ny = max(int(np.ceil(map_h / cell)), 1)
+    cell_size = np.array([map_w / nx, map_h / ny])
+
+    xs = np.arange(nx + 1) * cell_size[0]
+    ys = np.arange(ny + 1) * cell_size[1]
+    xy = np.stack(np.meshgrid(xs, ys), axis=-1)  # (ny + 1, nx + 1, 2)
+
+    # with no obstacles, the map diagonal bounds every in-map distance
+    sdf = np.full((ny + 1, nx + 1), float(np.hypot(map_w, map_h)))
+    for k in range(len(obs)):
+        np.minimum(sdf, square_sdf(xy, obs.centers[k], obs.half_widths[k], obs.cos_sin[k]), out=sdf)
+
+    return ClearanceField(sdf=sdf, origin=np.zeros(2), cell_size=cell_size, resolution=resolution)
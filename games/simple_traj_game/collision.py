@@ -0,0 +1,187 @@
+import math
+from dataclasses import dataclass
+from enum import StrEnum
+
+import numpy as np
+
+from .data_cls import SquareObstacle, HIT_RECORD_DTYPE
+
+from typing import List
+
+
+class HitEngine(StrEnum):
+    NUMPY   = "numpy"    # analytic kernels, broadcast over all pieces x obstacles
+    SHAPELY = "shapely"  # polygon-based reference implementation
+    PARITY  = "parity"   # run both and raise on any mismatch
+
+
+@dataclass
+class ObstacleArrays:
+    '''
+    Struct-of-arrays view of `List[SquareObstacle]`.
+    A square's local frame is rotated by (angle + 1/8) turn, so that it spans [-half_width, half_width]^2.
+    '''
+    centers: np.ndarray  # (K, 2)
+    half_widths: np.ndarray  # (K,)
+    cos_sin: np.ndarray  # (K, 2), cos/sin of the local x-axis
+    vertices: np.ndarray  # (K, 4, 2), same order as `utils.get_square_vertices`
+
+    @classmethod
+    def from_obstacles(cls, obstacles: List[SquareObstacle]) -> "ObstacleArrays":
+        return cls.from_params(
+            centers=np.array([obs.center_xy for obs in obstacles], dtype=np.float64).reshape(-1, 2),
+            widths=np.array([obs.width for obs in obstacles], dtype=np.float64),
+            angles=np.array([obs.angle for obs in obstacles], dtype=np.float64),
+        )
+
+    @classmethod
+    def from_params(cls, centers: np.ndarray, widths: np.ndarray, angles: np.ndarray) -> "ObstacleArrays":
+        '''
+        @param: angles
+            ∈[0.0, 1.0), same convention as `SquareObstacle.angle`; leading batch dims are allowed
+        '''
+        centers = np.asarray(centers, dtype=np.float64)
+        half_widths = np.asarray(widths, dtype=np.float64) / 2
+        a = 2 * math.pi * np.asarray(angles, dtype=np.float64)
+
+        # vertices sit at a, a+90°, a+180°, a-90°
+        vs_a = a[..., None] + np.array([0.0, 0.5, 1.0, -0.5]) * math.pi
+        r = half_widths[..., None] * (2 ** 0.5)
+        vertices = np.stack([np.cos(vs_a) * r, np.sin(vs_a) * r], axis=-1) + centers[..., None, :]
+
+        a_local = a + math.pi / 4
+        cos_sin = np.stack([np.cos(a_local), np.sin(a_local)], axis=-1)
+
+        return cls(centers=centers, half_widths=half_widths, cos_sin=cos_sin, vertices=vertices)
+
+    def __len__(self):
+        return self.half_widths.shape[-1]
+
+    def take(self, idxs: np.ndarray) -> "ObstacleArrays":
+        return ObstacleArrays(
+            centers=self.centers[idxs],
+            half_widths=self.half_widths[idxs],
+            cos_sin=self.cos_sin[idxs],
+            vertices=self.vertices[idxs],
+        )
+
+
+def to_local(xy: np.ndarray, centers: np.ndarray, cos_sin: np.ndarray):
+    dx = xy[..., 0] - centers[..., 0]
+    dy = xy[..., 1] - centers[..., 1]
+    c = cos_sin[..., 0]
+    s = cos_sin[..., 1]
+    return dx * c + dy * s, -dx * s + dy * c
+
+
+def disc_square_hits(
+    xy: np.ndarray, radius: float,
+    centers: np.ndarray, half_widths: np.ndarray, cos_sin: np.ndarray,
+) -> np.ndarray:
+    '''
+    Whether the open disc at `xy` intersects the interior of each square.
+    All array arguments broadcast elementwise (e.g. xy[:, None] against obstacles[None, :] gives a (T, K) mask).
+    '''
+    lx, ly = to_local(xy, centers, cos_sin)
+    qx = np.maximum(np.abs(lx) - half_widths, 0.0)
+    qy = np.maximum(np.abs(ly) - half_widths, 0.0)
+    return (qx * qx + qy * qy) < (radius * radius)
+
+
+def segment_square_hits(
+    xy0: np.ndarray, xy1: np.ndarray, radius: float,
+    centers: np.ndarray, half_widths: np.ndarray, cos_sin: np.ndarray,
+) -> np.ndarray:
+    '''
+    Whether the rectangle from `utils.extend_line(xy0, xy1, radius)` intersects the interior of each square.
+    Separating-axis test over the 2 square axes and the 2 rectangle axes; broadcasts like `disc_square_hits`.
+    Zero-length segments never hit (the vertex disc covers them).
+    '''
+    lx0, ly0 = to_local(xy0, centers, cos_sin)
+    lx1, ly1 = to_local(xy1, centers, cos_sin)
+
+    mx = (lx0 + lx1) / 2
+    my = (ly0 + ly1) / 2
+    ex = lx1 - lx0
+    ey = ly1 - ly0
+    seg_len = np.hypot(ex, ey)
+    valid = seg_len > 0.0
+    inv_len = np.divide(1.0, seg_len, out=np.zeros_like(seg_len), where=valid)
+    dx = np.abs(ex * inv_len)
+    dy = np.abs(ey * inv_len)
+    half_len = seg_len / 2
+
+    # rectangle axes: d=(dx, dy), n=(-dy, dx)
+    return (
+        valid
+        & (np.abs(mx) < half_widths + half_len * dx + radius * dy)
+        & (np.abs(my) < half_widths + half_len * dy + radius * dx)
+        & (np.abs(mx * ex + my * ey) * inv_len < half_len + half_widths * (dx + dy))
+        & (np.abs(-mx * ey + my * ex) * inv_len < radius + half_widths * (dx + dy))
+    )
+
+
+def calc_hit_masks(traj: np.ndarray, radius: float, obs: ObstacleArrays):
+    '''
+    @return: (vertex_hits (T, K), path_hits (T-1, K))
+    '''
+    centers = obs.centers[None, :, :]
+    half_widths = obs.half_widths[None, :]
+    cos_sin = obs.cos_sin[None, :, :]
+
+    vs_hits = disc_square_hits(traj[:, None, :], radius, centers, half_widths, cos_sin)
+    paths_hits = segment_square_hits(
+        traj[:-1, None, :], traj[1:, None, :], radius, centers, half_widths, cos_sin,
+    )
+    return vs_hits, paths_hits
+
+
+def calc_hit_rows_dense(traj: np.ndarray, radius: float, obs: ObstacleArrays, vs_idxs: np.ndarray, paths_idxs: np.ndarray):
+    '''
+    Dense counterpart of `spatial_index.calc_hit_rows`.
+    '''
+    centers = obs.centers[None, :, :]
+    half_widths = obs.half_widths[None, :]
+    cos_sin = obs.cos_sin[None, :, :]
+
+    vs_hits = disc_square_hits(traj[vs_idxs, None, :], radius, centers, half_widths, cos_sin)
+    paths_hits = segment_square_hits(
+        traj[paths_idxs, None, :], traj[paths_idxs + 1, None, :], radius, centers, half_widths, cos_sin,
+    )
+    return vs_hits, paths_hits
+
+
+def hit_masks_to_infos(vs_hits: np.ndarray, paths_hits: np.ndarray):
+    '''
+    Same ordering as the shapely implementation: vertices first, then paths, each in (traj_idx, obstacle_idx) order.
+    '''
+    return hit_pairs_to_infos(*np.nonzero(vs_hits), *np.nonzero(paths_hits))
+
+
+def hit_pairs_to_infos(vs_tr: np.ndarray, vs_obs: np.ndarray, paths_tr: np.ndarray, paths_obs: np.ndarray):
+    '''
+    Pairs must already be sorted by (traj_idx, obstacle_idx).
+    '''
+    return (
+        [((idx_tr, idx_tr), idx_obs) for idx_tr, idx_obs in zip(vs_tr.tolist(), vs_obs.tolist())]
+        + [((idx_tr, idx_tr + 1), idx_obs) for idx_tr, idx_obs in zip(paths_tr.tolist(), paths_obs.tolist())]
+    )
+
+
+def hit_masks_to_records(vs_hits: np.ndarray, paths_hits: np.ndarray) -> np.ndarray:
+    '''
+    `hit_masks_to_infos` as a `HIT_RECORD_DTYPE` array, without building Python tuples.
+    '''
+    return hit_pairs_to_records(*np.nonzero(vs_hits), *np.nonzero(paths_hits))
+
+
+def hit_pairs_to_records(vs_tr: np.ndarray, vs_obs: np.ndarray, paths_tr: np.ndarray, paths_obs: np.ndarray) -> np.ndarray:
+    records = np.empty(len(vs_tr) + len(paths_tr), dtype=HIT_RECORD_DTYPE)
+    n_vs = len(vs_tr)
+    records["seg_start"][:n_vs] = vs_tr
+    records["seg_end"][:n_vs] = vs_tr
+    records["obstacle_idx"][:n_vs] = vs_obs
+    records["seg_start"][n_vs:] = paths_tr
+    records["seg_end"][n_vs:] = paths_tr + 1
+    records["obstacle_idx"][n_vs:] = paths_obs
+    return records
@@ -1,9 +1,14 @@
 from dataclasses import dataclass
 
 import numpy as np
-from shapely import Polygon
 
-from typing import Tuple, List, Union, Optional
+from typing import Tuple, List, Union, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from shapely import Polygon
+    from .collision import ObstacleArrays
+    from .spatial_index import ObstacleGrid
+    from .clearance import ClearanceField
 
 
 @dataclass
@@ -25,22 +30,131 @@ class Attributes:
     target_xy: Tuple[float, float]  # down-left_corner=(0.0, 0.0)
 
     # caches
-    _obs_plgs: Optional[List[Polygon]] = None  # obstacles MultiPolygons
-    _obs_union_plgs: Optional[List[Polygon]] = None
+    _obs_plgs: Optional[List["Polygon"]] = None  # obstacles MultiPolygons
+    _obs_union_plgs: Optional[List["Polygon"]] = None
+    _obs_arrs: Optional["ObstacleArrays"] = None
+    _obs_grid: Optional["ObstacleGrid"] = None  # broad-phase index over `_obs_arrs`
+    _obs_sdf: Optional["ClearanceField"] = None  # signed-distance raster of the obstacles union
 
 
 _TrajType = Union[List[Tuple[float, float]], np.ndarray]
 
-@dataclass
+HIT_RECORD_DTYPE = np.dtype([("seg_start", np.int32), ("seg_end", np.int32), ("obstacle_idx", np.int32)])
+
+
+@dataclass(slots=True, eq=False)
 class Answer:
-    traj: _TrajType
+    traj: _TrajType  # stored as a private C-contiguous (T, 2) float32/float64 copy
 
     # caches
-    _vs_plgs: Optional[List[Polygon]] = None  # vertices MultiPolygons
-    _paths_plgs: Optional[List[Polygon]] = None  # paths MultiPolygons
-    _union_plgs: Optional[List[Polygon]] = None
+    _vs_plgs: Optional[List["Polygon"]] = None  # vertices MultiPolygons
+    _paths_plgs: Optional[List["Polygon"]] = None  # paths MultiPolygons
+    _union_plgs: Optional[List["Polygon"]] = None
+    _vs_hits: Optional[np.ndarray] = None  # (T, K) bool
+    _paths_hits: Optional[np.ndarray] = None  # (T-1, K) bool
+    _hits_attr: Optional[Attributes] = None  # map the hit masks were computed against
 
+    def __setattr__(self, name, value):
+        if name == "traj":
+            value = _as_traj_array(value)
+        object.__setattr__(self, name, value)
+        if name == "traj":
+            # reassigning the whole traj invalidates everything; `Game.move_waypoint` & co. edit incrementally
+            self.clear_caches()
 
-@dataclass
+    def __getstate__(self):
+        # caches are cheap to rebuild and expensive to pickle
+        return self.traj
+
+    def __setstate__(self, traj: np.ndarray):
+        self.traj = traj
+
+    def clear_caches(self):
+        for name in _ANSWER_CACHES:
+            object.__setattr__(self, name, None)
+
+    def clear_hit_caches(self):
+        object.__setattr__(self, "_vs_hits", None)
+        object.__setattr__(self, "_paths_hits", None)
+        object.__setattr__(self, "_hits_attr", None)
+
+    def _replace_traj(self, traj: np.ndarray):
+        # caller is responsible for keeping the caches in sync
+        object.__setattr__(self, "traj", traj)
+
+    def __eq__(self, other):
+        if not isinstance(other, Answer):
+            return NotImplemented
+        return np.array_equal(self.traj, other.traj)
+
+
+_ANSWER_CACHES = ("_vs_plgs", "_paths_plgs", "_union_plgs", "_vs_hits", "_paths_hits", "_hits_attr")
+
+
+def _as_traj_array(traj: _TrajType) -> np.ndarray:
+    # always copied: later writes to the caller's array would silently invalidate the cached masks and polygons
+    arr = np.array(traj, order="C")
+    if arr.dtype not in (np.float32, np.float64):
+        arr = arr.astype(np.float64)
+    return arr.reshape(-1, 2)
+
+
+@dataclass(slots=True, eq=False)
 class AnsEval:
-    hit_infos: List[Tuple[Tuple[int, int], int]]  # [((traj_idx_start, traj_idx_end), obstacle_idx)]
+    hit_records: np.ndarray  # (M,) HIT_RECORD_DTYPE, ordered like `hit_infos`
+    traj_len: int = -1  # number of traj vertices, -1 if unknown
+
+    @classmethod
+    def from_hit_infos(cls, hit_infos: List[Tuple[Tuple[int, int], int]], traj_len: int = -1) -> "AnsEval":
+        records = np.array(
+            [(idx_st, idx_en, idx_obs) for (idx_st, idx_en), idx_obs in hit_infos], dtype=HIT_RECORD_DTYPE,
+        )
+        return cls(hit_records=records, traj_len=traj_len)
+
+    @classmethod
+    def from_buffer(cls, buf, traj_len: int = -1) -> "AnsEval":
+        '''
+        Zero-copy inverse of `to_buffer`.
+        '''
+        return cls(hit_records=np.frombuffer(buf, dtype=HIT_RECORD_DTYPE), traj_len=traj_len)
+
+    def to_buffer(self) -> memoryview:
+        return memoryview(np.ascontiguousarray(self.hit_records)).cast("B")
+
+    @property
+    def hit_infos(self) -> List[Tuple[Tuple[int, int], int]]:
+        '''
+        [((traj_idx_start, traj_idx_end), obstacle_idx)], the original tuple format
+        '''
+        return [
+            ((idx_st, idx_en), idx_obs)
+            for idx_st, idx_en, idx_obs in zip(
+                self.hit_records["seg_start"].tolist(),
+                self.hit_records["seg_end"].tolist(),
+                self.hit_records["obstacle_idx"].tolist(),
+            )
+        ]
+
+    @property
+    def num_hits(self) -> int:
+        return len(self.hit_records)
+
+    def hit_counts_per_obstacle(self, num_obstacles: int) -> np.ndarray:
+        return np.bincount(self.hit_records["obstacle_idx"], minlength=num_obstacles)
+
+    def collided_fraction(self) -> float:
+        '''
+        Fraction of traj pieces (T vertices + T-1 paths) hitting at least one obstacle.
+        '''
+        if self.traj_len <= 0:
+            raise ValueError(f"{self.traj_len=}")
+        pieces = self.hit_records["seg_start"].astype(np.int64) + self.hit_records["seg_end"]  # vertex i -> 2i, path (i, i+1) -> 2i+1
+        return len(np.unique(pieces)) / (2 * self.traj_len - 1)
+
+    def __eq__(self, other):
+        if not isinstance(other, AnsEval):
+            return NotImplemented
+        return (self.traj_len == other.traj_len) and np.array_equal(self.hit_records, other.hit_records)
+
+    def __repr__(self):
+        return f"AnsEval(hit_infos={self.hit_infos}, traj_len={self.traj_len})"
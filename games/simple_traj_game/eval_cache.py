@@ -0,0 +1,152 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .data_cls import Attributes, AnsEval
+from .collision import HitEngine
+
+from typing import Dict, Hashable, Optional, Tuple
+
+
+# rough per-entry bookkeeping (key, `OrderedDict` node, `AnsEval`), on top of the hit records themselves
+_ENTRY_OVERHEAD_BYTES = 256
+
+EvalKey = Tuple[bytes, HitEngine, bytes]
+
+
+def map_content_key(attr: Attributes) -> bytes:
+    '''
+    Digest of everything defining a map, so equal maps built separately (e.g. reloaded from a bank) share a key.
+    '''
+    obs = np.array([(*ob.center_xy, ob.width, ob.angle) for ob in attr.obstacles], dtype=np.float64)
+    digest = hashlib.blake2b(obs.tobytes(), digest_size=16)
+    digest.update(np.array(
+        [*attr.map_size, attr.self_radius, *attr.start_xy, *attr.target_xy], dtype=np.float64,
+    ).tobytes())
+    return digest.digest()
+
+
+class EvalCache:
+    '''
+    Memoizes `Game.evaluate_ans` across games: an LRU of `AnsEval`s keyed by the map content, the hit engine and the
+    traj bytes, bounded by entry count and approximate bytes.
+    Also a registry of maps, so `Game`s of equal maps share one `Attributes` and with it the obstacle-side geometry
+    caches (polygons, union, arrays, broad-phase grid, clearance raster).
+    Pass it as `Game(eval_cache=...)`; it belongs to one process.
+    '''
+    def __init__(
+        self,
+        max_entries: int = 65536,
+        max_bytes: Optional[int] = 64 * 1024**2,
+        quantum: Optional[float] = None,
+        max_maps: int = 1024,
+    ):
+        '''
+        @param: max_bytes
+            bound on the approximate memory of the cached evaluations, `None` for the entry count only
+        @param: quantum
+            trajs are rounded to multiples of it before hashing, so nearly identical trajs share an evaluation;
+            the cached result is then that of the first traj seen, exact only up to the tolerance
+        @param: max_maps
+            maps kept in the registry (least recently used ones are forgotten, their games keep working)
+        '''
+        if (max_entries < 1) or (max_maps < 1) or ((quantum is not None) and quantum <= 0.0):
+            raise ValueError(f"{max_entries=}, {max_maps=}, {quantum=}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.quantum = quantum
+        self.max_maps = max_maps
+
+        self.entries: "OrderedDict[EvalKey, AnsEval]" = OrderedDict()
+        self.maps: "OrderedDict[bytes, Attributes]" = OrderedDict()
+        self.num_bytes = 0
+        self.reset_stats()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def share_map(self, map_key: bytes, attr: Attributes) -> Attributes:
+        '''
+        @return: the registered `Attributes` equal to `attr`, or `attr` itself, now registered
+        '''
+        shared = self.maps.get(map_key)
+        if shared is not None:
+            self.maps.move_to_end(map_key)
+            self.map_hits += 1
+            return shared
+        self.map_misses += 1
+        self.maps[map_key] = attr
+        if len(self.maps) > self.max_maps:
+            self.maps.popitem(last=False)
+        return attr
+
+    def key(self, map_key: bytes, hit_engine: HitEngine, traj: np.ndarray) -> EvalKey:
+        traj = np.asarray(traj, dtype=np.float64)
+        if self.quantum is not None:
+            traj = np.round(traj / self.quantum).astype(np.int64)
+        return (map_key, hit_engine, hashlib.blake2b(traj.tobytes(), digest_size=16).digest())
+
+    def get(self, key: EvalKey) -> Optional[AnsEval]:
+        ans_eval = self.entries.get(key)
+        if ans_eval is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        # fresh object around the shared read-only records
+        return AnsEval(hit_records=ans_eval.hit_records, traj_len=ans_eval.traj_len)
+
+    def put(self, key: EvalKey, ans_eval: AnsEval):
+        if key in self.entries:
+            return
+        records = ans_eval.hit_records.copy()
+        records.flags.writeable = False
+        self.entries[key] = AnsEval(hit_records=records, traj_len=ans_eval.traj_len)
+        self.num_bytes += _entry_bytes(records)
+        while (len(self.entries) > self.max_entries) or (
+            (self.max_bytes is not None) and (self.num_bytes > self.max_bytes) and (len(self.entries) > 1)
+        ):
+            _, evicted = self.entries.popitem(last=False)
+            self.num_bytes -= _entry_bytes(evicted.hit_records)
+            self.evictions += 1
+
+    def clear(self):
+        '''
+        Forget every evaluation and map, and reset the counters.
+        '''
+        self.entries.clear()
+        self.maps.clear()
+        self.num_bytes = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        '''
+        Reset the counters only, e.g. to measure the hit rate of one phase of training.
+        '''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.map_hits = 0
+        self.map_misses = 0
+
+    def stats(self) -> Dict[str, Hashable]:
+        '''
+        Counters for sizing the cache: a high eviction count with a low hit rate asks for more room.
+        '''
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.num_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            "evictions": self.evictions,
+            "maps": len(self.maps),
+            "map_hits": self.map_hits,
+            "map_misses": self.map_misses,
+        }
+
+
+def _entry_bytes(records: np.ndarray) -> int:
+    return records.nbytes + _ENTRY_OVERHEAD_BYTES
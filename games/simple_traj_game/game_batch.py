@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .data_cls import Attributes, SquareObstacle, AnsEval
+from .collision import ObstacleArrays, disc_square_hits, segment_square_hits, hit_masks_to_infos, hit_masks_to_records
+from .raster import rasterize
+from .scenario_bank import ScenarioBank
+
+from typing import List, Tuple, Optional, Sequence
+
+
+@dataclass
+class BatchEval:
+    vertex_hits: np.ndarray  # (N, T, K) bool, traj vertex t hits obstacle k
+    path_hits: np.ndarray  # (N, T-1, K) bool, traj path (t, t+1) hits obstacle k
+    hit_counts: np.ndarray  # (N,) int, equals `len(AnsEval.hit_infos)` of each env
+    first_hit_idxs: np.ndarray  # (N,) int, first traj_idx whose vertex or outgoing path hits, -1 if none
+
+    def hit_infos(self, env_idx: int) -> List[Tuple[Tuple[int, int], int]]:
+        return hit_masks_to_infos(self.vertex_hits[env_idx], self.path_hits[env_idx])
+
+    def ans_eval(self, env_idx: int, traj_len: int = -1) -> AnsEval:
+        return AnsEval(
+            hit_records=hit_masks_to_records(self.vertex_hits[env_idx], self.path_hits[env_idx]),
+            traj_len=traj_len,
+        )
+
+
+class GameBatch:
+    '''
+    N maps stored as struct-of-arrays; obstacles are padded to the largest map and masked by `obs_mask`.
+    '''
+    def __init__(
+        self,
+        centers: np.ndarray,  # (N, K, 2)
+        widths: np.ndarray,  # (N, K)
+        angles: np.ndarray,  # (N, K)
+        obs_mask: np.ndarray,  # (N, K) bool
+        self_radius: np.ndarray,  # (N,)
+        map_size: np.ndarray,  # (N, 2)
+        start_xy: np.ndarray,  # (N, 2)
+        target_xy: np.ndarray,  # (N, 2)
+    ):
+        self.widths = np.asarray(widths, dtype=np.float64)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.obs = ObstacleArrays.from_params(centers, self.widths, self.angles)
+        self.obs_mask = np.asarray(obs_mask, dtype=bool)
+        self.self_radius = np.asarray(self_radius, dtype=np.float64)
+        self.map_size = np.asarray(map_size, dtype=np.float64)
+        self.start_xy = np.asarray(start_xy, dtype=np.float64)
+        self.target_xy = np.asarray(target_xy, dtype=np.float64)
+
+    @classmethod
+    def from_attributes(cls, attrs: List[Attributes]) -> "GameBatch":
+        n = len(attrs)
+        centers, widths, angles, obs_mask = _pad_obstacle_params(attrs)
+        return cls(
+            centers=centers,
+            widths=widths,
+            angles=angles,
+            obs_mask=obs_mask,
+            self_radius=np.array([attr.self_radius for attr in attrs]),
+            map_size=np.array([attr.map_size for attr in attrs]).reshape(n, 2),
+            start_xy=np.array([attr.start_xy for attr in attrs]).reshape(n, 2),
+            target_xy=np.array([attr.target_xy for attr in attrs]).reshape(n, 2),
+        )
+
+    @classmethod
+    def from_bank(cls, bank: ScenarioBank, idxs: Sequence[int]) -> "GameBatch":
+        idxs = np.asarray(idxs, dtype=np.int64)
+        centers, widths, angles, obs_mask = bank.get_padded_params(idxs)
+        return cls(
+            centers=centers,
+            widths=widths,
+            angles=angles,
+            obs_mask=obs_mask,
+            self_radius=bank.self_radius[idxs],
+            map_size=bank.map_size[idxs],
+            start_xy=bank.start_xy[idxs],
+            target_xy=bank.target_xy[idxs],
+        )
+
+    def __len__(self):
+        return self.obs_mask.shape[0]
+
+    def get_attributes(self, env_idx: int) -> Attributes:
+        ks = np.nonzero(self.obs_mask[env_idx])[0]
+        return Attributes(
+            map_size=tuple(self.map_size[env_idx].tolist()),
+            self_radius=float(self.self_radius[env_idx]),
+            obstacles=[SquareObstacle(
+                center_xy=tuple(self.obs.centers[env_idx, k].tolist()),
+                width=float(self.widths[env_idx, k]),
+                angle=float(self.angles[env_idx, k]),
+            ) for k in ks],
+            start_xy=tuple(self.start_xy[env_idx].tolist()),
+            target_xy=tuple(self.target_xy[env_idx].tolist()),
+        )
+
+    def evaluate(self, trajs: np.ndarray, lengths: Optional[np.ndarray] = None, chunk_size: int = 1024) -> BatchEval:
+        '''
+        @param: trajs
+            (N, T, 2), padded trajectories
+        @param: lengths
+            (N,), number of valid vertices of each traj; `None` means all T are valid
+        @param: chunk_size
+            envs per vectorized pass, bounding the (chunk, T, K) temporaries
+        '''
+        trajs = np.asarray(trajs, dtype=np.float64)
+        n, t = trajs.shape[:2]
+        if n != len(self):
+            raise ValueError(f"{trajs.shape=}, num_envs={len(self)}")
+        lengths = np.full(n, t) if (lengths is None) else np.asarray(lengths)
+
+        k = self.obs_mask.shape[1]
+        vertex_hits = np.zeros((n, t, k), dtype=bool)
+        path_hits = np.zeros((n, max(t - 1, 0), k), dtype=bool)
+        for st in range(0, n, chunk_size):
+            en = min(st + chunk_size, n)
+            vertex_hits[st:en], path_hits[st:en] = self._calc_hit_masks(slice(st, en), trajs[st:en], lengths[st:en])
+
+        vs_any = vertex_hits.any(axis=2)
+        pieces_any = vs_any.copy()
+        pieces_any[:, :-1] |= path_hits.any(axis=2)
+        first_hit_idxs = np.where(pieces_any.any(axis=1), pieces_any.argmax(axis=1), -1)
+
+        return BatchEval(
+            vertex_hits=vertex_hits,
+            path_hits=path_hits,
+            hit_counts=vertex_hits.sum(axis=(1, 2)) + path_hits.sum(axis=(1, 2)),
+            first_hit_idxs=first_hit_idxs,
+        )
+
+    def render_arrays(
+        self,
+        trajs: Optional[np.ndarray] = None,
+        lengths: Optional[np.ndarray] = None,
+        height: int = 64,
+        width: int = 64,
+        channels: int = 3,
+    ) -> np.ndarray:
+        '''
+        @return: (N, height, width, channels) uint8, see `raster.rasterize`
+        '''
+        return rasterize(
+            self.obs, self.obs_mask, self.self_radius, self.map_size, self.start_xy, self.target_xy,
+            trajs=None if (trajs is None) else np.asarray(trajs, dtype=np.float64),
+            lengths=lengths,
+            height=height,
+            width=width,
+            channels=channels,
+        )
+
+    def _calc_hit_masks(self, envs: slice, trajs: np.ndarray, lengths: np.ndarray):
+        t = trajs.shape[1]
+        radius = self.self_radius[envs, None, None]
+        centers = self.obs.centers[envs, None, :, :]
+        half_widths = self.obs.half_widths[envs, None, :]
+        cos_sin = self.obs.cos_sin[envs, None, :, :]
+        obs_mask = self.obs_mask[envs, None, :]
+        steps = np.arange(t)
+
+        vertex_hits = disc_square_hits(trajs[:, :, None, :], radius, centers, half_widths, cos_sin)
+        vertex_hits &= obs_mask & (steps[None, :, None] < lengths[:, None, None])
+
+        path_hits = segment_square_hits(
+            trajs[:, :-1, None, :], trajs[:, 1:, None, :], radius, centers, half_widths, cos_sin,
+        )
+        path_hits &= obs_mask & (steps[None, :-1, None] < (lengths[:, None, None] - 1))
+
+        return vertex_hits, path_hits
+
+
+def _pad_obstacle_params(
+    attrs: Sequence[Attributes],
+    k_max: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    @param: k_max
+        padded obstacle count, at least the largest one of `attrs`; by default exactly it
+    @return: (centers (N, K, 2), widths (N, K), angles (N, K), obs_mask (N, K)), like `ScenarioBank.get_padded_params`
+    '''
+    n = len(attrs)
+    if k_max is None:
+        k_max = max((len(attr.obstacles) for attr in attrs), default=0)
+    centers = np.zeros((n, k_max, 2))
+    widths = np.zeros((n, k_max))
+    angles = np.zeros((n, k_max))
+    obs_mask = np.zeros((n, k_max), dtype=bool)
+    for i, attr in enumerate(attrs):
+        k = len(attr.obstacles)
+        # reshaped, as an empty list does not broadcast into (0, 2)
+        centers[i, :k] = np.asarray([obs.center_xy for obs in attr.obstacles], dtype=np.float64).reshape(k, 2)
+        widths[i, :k] = [obs.width for obs in attr.obstacles]
+        angles[i, :k] = [obs.angle for obs in attr.obstacles]
+        obs_mask[i, :k] = True
+    return centers, widths, angles, obs_mask
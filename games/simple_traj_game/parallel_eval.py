@@ -0,0 +1,130 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .data_cls import AnsEval
+from .game_batch import GameBatch
+from .collision import hit_pairs_to_records
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+_ArrSpec = Tuple[str, Tuple[int, ...], str]  # (shm_name, shape, dtype)
+
+
+class ParallelEvaluator:
+    '''
+    Shards (scenario, answer) pairs over a process pool.
+    Every call to `evaluate` publishes its arrays once in shared memory; tasks only carry (start, end) ranges,
+    and `AnsEval`s stream back in input order.
+    '''
+    def __init__(self, num_workers: Optional[int] = None, chunk_size: int = 1024, mp_context: Optional[str] = None):
+        self.num_workers = num_workers if (num_workers is not None) else mp.cpu_count()
+        self.chunk_size = chunk_size
+        # started before forking, so workers share it instead of each one tracking (and unlinking) attached segments
+        resource_tracker.ensure_running()
+        self.pool = mp.get_context(mp_context).Pool(self.num_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def evaluate(self, batch: GameBatch, trajs: np.ndarray, lengths: Optional[np.ndarray] = None) -> Iterator[AnsEval]:
+        '''
+        @param: trajs
+            (N, T, 2), answer of env i is `trajs[i, :lengths[i]]`
+        '''
+        trajs = np.asarray(trajs, dtype=np.float64)
+        n, t = trajs.shape[:2]
+        if n != len(batch):
+            raise ValueError(f"{trajs.shape=}, num_envs={len(batch)}")
+        lengths = np.full(n, t, dtype=np.int64) if (lengths is None) else np.asarray(lengths, dtype=np.int64)
+
+        arrs = {
+            "centers": batch.obs.centers, "widths": batch.widths, "angles": batch.angles, "obs_mask": batch.obs_mask,
+            "self_radius": batch.self_radius, "map_size": batch.map_size,
+            "start_xy": batch.start_xy, "target_xy": batch.target_xy,
+            "trajs": trajs, "lengths": lengths,
+        }
+        shms: List[shared_memory.SharedMemory] = []
+        try:
+            specs: Dict[str, _ArrSpec] = {}
+            for name, arr in arrs.items():
+                shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                shms.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                specs[name] = (shm.name, arr.shape, arr.dtype.str)
+
+            tasks = [(specs, st, min(st + self.chunk_size, n)) for st in range(0, n, self.chunk_size)]
+            for st, vs_hits, paths_hits in self.pool.imap(_evaluate_chunk, tasks):
+                yield from _split_ans_evals(vs_hits, paths_hits, lengths[st:st + self.chunk_size])
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+
+def _split_ans_evals(vs_hits: np.ndarray, paths_hits: np.ndarray, lengths: np.ndarray) -> Iterator[AnsEval]:
+    '''
+    @param: vs_hits, paths_hits
+        (M, 3) rows of (env_idx within chunk, traj_idx, obstacle_idx), sorted
+    @param: lengths
+        traj lengths of the envs in the chunk
+    '''
+    num_envs = len(lengths)
+    vs_bounds = np.searchsorted(vs_hits[:, 0], np.arange(num_envs + 1))
+    paths_bounds = np.searchsorted(paths_hits[:, 0], np.arange(num_envs + 1))
+    for i in range(num_envs):
+        vs = vs_hits[vs_bounds[i]:vs_bounds[i + 1]]
+        paths = paths_hits[paths_bounds[i]:paths_bounds[i + 1]]
+        yield AnsEval(
+            hit_records=hit_pairs_to_records(vs[:, 1], vs[:, 2], paths[:, 1], paths[:, 2]),
+            traj_len=int(lengths[i]),
+        )
+
+
+# worker side
+def _evaluate_chunk(task: Tuple[Dict[str, _ArrSpec], int, int]):
+    specs, st, en = task
+    shms = {shm_name: shared_memory.SharedMemory(name=shm_name) for shm_name, _, _ in specs.values()}
+    try:
+        return _evaluate_attached(specs, shms, st, en)
+    finally:
+        # unmapped after every chunk, so an idle worker never keeps segments the parent has unlinked resident
+        for shm in shms.values():
+            try:
+                shm.close()
+            except BufferError:
+                pass  # views kept alive by the traceback of an error; unmapped when it is dropped
+
+
+def _evaluate_attached(specs: Dict[str, _ArrSpec], shms: Dict[str, shared_memory.SharedMemory], st: int, en: int):
+    arrs = {
+        name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shms[shm_name].buf)
+        for name, (shm_name, shape, dtype) in specs.items()
+    }
+    batch = GameBatch(
+        centers=arrs["centers"][st:en],
+        widths=arrs["widths"][st:en],
+        angles=arrs["angles"][st:en],
+        obs_mask=arrs["obs_mask"][st:en],
+        self_radius=arrs["self_radius"][st:en],
+        map_size=arrs["map_size"][st:en],
+        start_xy=arrs["start_xy"][st:en],
+        target_xy=arrs["target_xy"][st:en],
+    )
+    batch_eval = batch.evaluate(arrs["trajs"][st:en], arrs["lengths"][st:en])
+    # sparse (env, traj_idx, obstacle_idx) rows are far cheaper to send back than the dense masks;
+    # fresh arrays, so that no view of the shared memory outlives this call
+    return (
+        st,
+        np.argwhere(batch_eval.vertex_hits).astype(np.int32),
+        np.argwhere(batch_eval.path_hits).astype(np.int32),
+    )
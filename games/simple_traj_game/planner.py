@@ -0,0 +1,136 @@
+import multiprocessing as mp
+
+import numpy as np
+
+from .data_cls import Answer
+from .collision import ObstacleArrays, disc_square_hits, segment_square_hits
+from .scenario_bank import ScenarioBank
+from .simple_traj_game import Game
+
+from typing import List, Optional, Sequence
+
+
+def plan_traj(
+    obs: ObstacleArrays,
+    radius: float,
+    start_xy: Sequence[float],
+    target_xy: Sequence[float],
+    margin: float = 1e-6,
+) -> Optional[np.ndarray]:
+    '''
+    Shortest collision-free polyline on the visibility graph of the obstacle corners inflated by `radius`.
+    Edges are validated with the game's own kernels, so `Game.evaluate_ans` reports no hit on the result.
+    @param: margin
+        relative extra inflation, keeping paths along an inflated side strictly outside the obstacle
+    @return: (P, 2) traj from start to target, or `None` if the endpoints collide or no path exists
+    '''
+    start_xy = np.asarray(start_xy, dtype=np.float64)
+    target_xy = np.asarray(target_xy, dtype=np.float64)
+    if _disc_hits_any(np.stack([start_xy, target_xy]), radius, obs).any():
+        return None
+    if not _segment_hits_any(start_xy[None], target_xy[None], radius, obs)[0]:
+        return np.stack([start_xy, target_xy])
+
+    # inflated corners, in each square's local frame then back to world
+    d = (obs.half_widths + radius * (1.0 + margin))[:, None]
+    local = np.array([[1.0, 1.0], [-1.0, 1.0], [-1.0, -1.0], [1.0, -1.0]])[None] * d[..., None]  # (K, 4, 2)
+    c = obs.cos_sin[:, None, 0]
+    s = obs.cos_sin[:, None, 1]
+    corners = np.stack([
+        local[..., 0] * c - local[..., 1] * s,
+        local[..., 0] * s + local[..., 1] * c,
+    ], axis=-1) + obs.centers[:, None, :]
+    corners = corners.reshape(-1, 2)
+    corners = corners[~_disc_hits_any(corners, radius, obs)]
+
+    nodes = np.concatenate([start_xy[None], target_xy[None], corners])  # start=0, target=1
+    n = len(nodes)
+    ii, jj = np.triu_indices(n, k=1)
+    free = ~_segment_hits_any(nodes[ii], nodes[jj], radius, obs)
+    weights = np.full((n, n), np.inf)
+    lens = np.hypot(*(nodes[jj[free]] - nodes[ii[free]]).T)
+    weights[ii[free], jj[free]] = lens
+    weights[jj[free], ii[free]] = lens
+
+    prev = _dijkstra(weights, src=0, dst=1)
+    if prev is None:
+        return None
+    path = [1]
+    while path[-1] != 0:
+        path.append(prev[path[-1]])
+    return nodes[path[::-1]]
+
+
+def plan_answer(game: Game) -> Optional[Answer]:
+    attr = game.get_attributes()
+    traj = plan_traj(game._get_obs_arrs(), attr.self_radius, attr.start_xy, attr.target_xy)
+    return None if (traj is None) else Answer(traj)
+
+
+def plan_bank(
+    bank: ScenarioBank,
+    idxs: Sequence[int],
+    num_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> List[Optional[np.ndarray]]:
+    '''
+    Label scenarios of a bank in parallel; workers re-open the memory-mapped bank instead of receiving maps.
+    '''
+    idxs = [int(idx) for idx in idxs]
+    chunks = [idxs[st:st + chunk_size] for st in range(0, len(idxs), chunk_size)]
+    num_workers = num_workers if (num_workers is not None) else mp.cpu_count()
+    if num_workers <= 1:
+        return [traj for chunk in chunks for traj in _plan_bank_chunk((bank.bank_dir, chunk))]
+    with mp.Pool(num_workers) as pool:
+        return [traj for res in pool.imap(_plan_bank_chunk, [(bank.bank_dir, chunk) for chunk in chunks]) for traj in res]
+
+
+def _plan_bank_chunk(task) -> List[Optional[np.ndarray]]:
+    bank_dir, idxs = task
+    bank = ScenarioBank(bank_dir)
+    trajs = []
+    for idx in idxs:
+        centers, widths, angles = bank.get_obstacle_params(idx)
+        trajs.append(plan_traj(
+            ObstacleArrays.from_params(centers, widths, angles),
+            float(bank.self_radius[idx]),
+            bank.start_xy[idx],
+            bank.target_xy[idx],
+        ))
+    return trajs
+
+
+def _disc_hits_any(xy: np.ndarray, radius: float, obs: ObstacleArrays) -> np.ndarray:
+    return disc_square_hits(
+        xy[:, None], radius, obs.centers[None], obs.half_widths[None], obs.cos_sin[None],
+    ).any(axis=1)
+
+
+def _segment_hits_any(xy0: np.ndarray, xy1: np.ndarray, radius: float, obs: ObstacleArrays) -> np.ndarray:
+    return segment_square_hits(
+        xy0[:, None], xy1[:, None], radius, obs.centers[None], obs.half_widths[None], obs.cos_sin[None],
+    ).any(axis=1)
+
+
+def _dijkstra(weights: np.ndarray, src: int, dst: int) -> Optional[np.ndarray]:
+    '''
+    Array-based Dijkstra, O(N^2), which suits the dense visibility graph.
+    @return: predecessor of every node, or `None` if `dst` is unreachable
+    '''
+    n = len(weights)
+    dist = np.full(n, np.inf)
+    dist[src] = 0.0
+    prev = np.full(n, -1)
+    done = np.zeros(n, dtype=bool)
+    for _ in range(n):
+        u = int(np.argmin(np.where(done, np.inf, dist)))
+        if np.isinf(dist[u]):
+            return None
+        if u == dst:
+            return prev
+        done[u] = True
+        cand = dist[u] + weights[u]
+        better = (cand < dist) & ~done
+        dist[better] = cand[better]
+        prev[better] = u
+    return None
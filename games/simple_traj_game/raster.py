@@ -0,0 +1,103 @@
+import numpy as np
+
+from .collision import ObstacleArrays
+
+from typing import Optional
+
+
+# 1-channel layering; with 3 channels each layer gets its own channel (obstacles, trajectory, start/target) at 255
+OBSTACLE_VALUE = 255
+TRAJ_VALUE = 170
+ENDPOINT_VALUE = 85
+
+
+def rasterize(
+    obs: ObstacleArrays,  # (N, K) arrays
+    obs_mask: np.ndarray,  # (N, K)
+    self_radius: np.ndarray,  # (N,)
+    map_size: np.ndarray,  # (N, 2)
+    start_xy: np.ndarray,  # (N, 2)
+    target_xy: np.ndarray,  # (N, 2)
+    trajs: Optional[np.ndarray] = None,  # (N, T, 2)
+    lengths: Optional[np.ndarray] = None,  # (N,)
+    height: int = 64,
+    width: int = 64,
+    channels: int = 3,
+    chunk_size: int = 256,
+) -> np.ndarray:
+    '''
+    Occupancy images sampled at pixel centers; row 0 is the top of the map (y = map_h).
+    @return: (N, height, width, channels) uint8
+    '''
+    if channels not in (1, 3):
+        raise ValueError(f"{channels=}")
+
+    n = obs_mask.shape[0]
+    imgs = np.zeros((n, height, width, channels), dtype=np.uint8)
+    for st in range(0, n, chunk_size):
+        en = min(st + chunk_size, n)
+        layers = _rasterize_layers(
+            obs.take(slice(st, en)), obs_mask[st:en], self_radius[st:en], map_size[st:en],
+            start_xy[st:en], target_xy[st:en],
+            None if (trajs is None) else trajs[st:en],
+            None if (lengths is None) else lengths[st:en],
+            height, width,
+        )
+        if channels == 3:
+            for c, layer in enumerate(layers):
+                imgs[st:en, :, :, c][layer] = 255
+        else:
+            for layer, val in zip(layers[::-1], (ENDPOINT_VALUE, TRAJ_VALUE, OBSTACLE_VALUE)):
+                imgs[st:en, :, :, 0][layer] = val
+
+    return imgs
+
+
+def _rasterize_layers(
+    obs: ObstacleArrays, obs_mask: np.ndarray, self_radius: np.ndarray, map_size: np.ndarray,
+    start_xy: np.ndarray, target_xy: np.ndarray, trajs: Optional[np.ndarray], lengths: Optional[np.ndarray],
+    height: int, width: int,
+):
+    # pixel centers kept as separate (n, 1, W) / (n, H, 1) axes, so every test below broadcasts to (n, H, W)
+    n = obs_mask.shape[0]
+    px = (np.arange(width) + 0.5) / width * map_size[:, None, None, 0]
+    py = (height - 0.5 - np.arange(height))[:, None] / height * map_size[:, None, None, 1]
+    r2 = (self_radius ** 2)[:, None, None]
+
+    obs_layer = np.zeros((n, height, width), dtype=bool)
+    for k in range(obs_mask.shape[1]):
+        dx = px - obs.centers[:, None, None, k, 0]
+        dy = py - obs.centers[:, None, None, k, 1]
+        c = obs.cos_sin[:, None, None, k, 0]
+        s = obs.cos_sin[:, None, None, k, 1]
+        hw = np.where(obs_mask[:, k], obs.half_widths[:, k], -1.0)[:, None, None]
+        obs_layer |= (np.abs(dx * c + dy * s) <= hw) & (np.abs(dy * c - dx * s) <= hw)
+
+    endpoints_layer = (
+        (_sq_dist(px, py, start_xy[:, None, None]) <= r2)
+        | (_sq_dist(px, py, target_xy[:, None, None]) <= r2)
+    )
+
+    traj_layer = np.zeros((n, height, width), dtype=bool)
+    if trajs is not None:
+        t = trajs.shape[1]
+        lengths = np.full(n, t) if (lengths is None) else np.asarray(lengths)
+        # invalid (padded) pieces get a negative radius so they never cover a pixel
+        for idx in range(t):
+            a = trajs[:, None, None, idx]
+            traj_layer |= _sq_dist(px, py, a) <= np.where(idx < lengths, 1.0, -1.0)[:, None, None] * r2
+            if idx + 1 < t:
+                ab = trajs[:, None, None, idx + 1] - a
+                ab2 = np.maximum(ab[..., 0] ** 2 + ab[..., 1] ** 2, 1e-24)
+                dx = px - a[..., 0]
+                dy = py - a[..., 1]
+                proj = np.clip((dx * ab[..., 0] + dy * ab[..., 1]) / ab2, 0.0, 1.0)
+                dx = dx - proj * ab[..., 0]
+                dy = dy - proj * ab[..., 1]
+                traj_layer |= (dx * dx + dy * dy) <= np.where(idx + 1 < lengths, 1.0, -1.0)[:, None, None] * r2
+
+    return obs_layer, traj_layer, endpoints_layer
+
+
+def _sq_dist(px: np.ndarray, py: np.ndarray, xy: np.ndarray) -> np.ndarray:
+    return (px - xy[..., 0]) ** 2 + (py - xy[..., 1]) ** 2
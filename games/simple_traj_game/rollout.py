@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .data_cls import Attributes, Answer
+from .scenario_bank import ScenarioCfg, sample_attributes
+from .simple_traj_game import Game
+from .game_batch import _pad_obstacle_params
+
+from typing import Callable, Dict, Optional
+
+
+# (map, rng) -> (T, 2) traj, T fixed for a policy
+TrajPolicy = Callable[[Attributes, np.random.Generator], np.ndarray]
+
+
+def collect_rollouts(
+    policy: TrajPolicy,
+    rng: np.random.Generator,
+    num_games: int = 64,
+    cfg: Optional[ScenarioCfg] = None,
+) -> Dict[str, np.ndarray]:
+    '''
+    Play `num_games` freshly sampled maps with `policy`, scoring every answer with `Game.evaluate_ans`.
+    Fits `ActorLearnerExecutor`'s actor function through `functools.partial(collect_rollouts, num_games=...)`.
+    @return:
+        "trajs" (N, T, 2), "num_hits" (N,), "collided_fraction" (N,),
+        and the maps as "centers" (N, K, 2), "widths" (N, K), "angles" (N, K), "obs_mask" (N, K), K the most obstacles
+    '''
+    cfg = ScenarioCfg() if (cfg is None) else cfg
+    attrs = []
+    trajs = []
+    num_hits = np.zeros(num_games, dtype=np.int64)
+    collided_fraction = np.zeros(num_games)
+    for i in range(num_games):
+        attr = sample_attributes(rng, cfg)
+        game = Game(attr=attr)
+        traj = np.asarray(policy(attr, rng), dtype=np.float64)
+        game.apply_answer(Answer(traj))
+        ans_eval = game.evaluate_ans()
+        trajs.append(traj)
+        num_hits[i] = ans_eval.num_hits
+        collided_fraction[i] = ans_eval.collided_fraction()
+        attrs.append(attr)
+
+    # padded to the config's most obstacles, so every call stacks alike
+    centers, widths, angles, obs_mask = _pad_obstacle_params(attrs, k_max=cfg.num_obstacles[1])
+    return {
+        "trajs": np.stack(trajs),
+        "num_hits": num_hits,
+        "collided_fraction": collided_fraction,
+        "centers": centers,
+        "widths": widths,
+        "angles": angles,
+        "obs_mask": obs_mask,
+    }
+
+
+@dataclass
+class LineOffsetPolicy:
+    '''
+    Baseline policy: `len(offsets) + 2` waypoints evenly spaced on the start-target line, the inner ones shifted by
+    `offsets` plus Gaussian noise of `std`. Map-agnostic, which makes it a cheap smoke test for learners.
+    '''
+    offsets: np.ndarray  # (T-2, 2)
+    std: float = 0.05
+
+    def __call__(self, attr: Attributes, rng: np.random.Generator) -> np.ndarray:
+        ts = np.linspace(0.0, 1.0, len(self.offsets) + 2)[:, None]
+        traj = (1.0 - ts) * np.array(attr.start_xy) + ts * np.array(attr.target_xy)
+        traj[1:-1] += self.offsets + rng.normal(0.0, self.std, self.offsets.shape)
+        return traj
@@ -0,0 +1,158 @@
+import os
+import json
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+from .data_cls import Attributes, SquareObstacle
+from .collision import ObstacleArrays
+
+from typing import Tuple, Optional, Sequence
+
+
+# fixed so that a bank depends only on (cfg, seed), never on how it was chunked
+_GEN_CHUNK = 65536
+
+_PER_OBS_FIELDS = ("centers", "widths", "angles")
+_PER_MAP_FIELDS = ("offsets", "map_size", "self_radius", "start_xy", "target_xy")
+
+
+@dataclass
+class ScenarioCfg:
+    '''
+    Defaults reproduce the distribution of `Game()`.
+    '''
+    map_size: Tuple[float, float] = (1.0, 1.0)
+    self_radius: float = 0.03
+    num_obstacles: Tuple[int, int] = (5, 5)  # inclusive range
+    center_range: Tuple[float, float] = (0.2, 0.8)  # fraction of map w/h
+    width_range: Tuple[float, float] = (0.05, 0.15)  # fraction of min(map w, h)
+    start_xy: Tuple[float, float] = (0.0, 0.0)
+    target_xy: Tuple[float, float] = (1.0, 1.0)
+
+
+def generate_scenarios(bank_dir: str, num_scenarios: int, seed: int, cfg: Optional[ScenarioCfg] = None):
+    '''
+    Write `num_scenarios` maps as columnar .npy files under `bank_dir`:
+        per obstacle: centers (M, 2), widths (M,), angles (M,)
+        per map: offsets (N+1,) into the obstacle arrays, map_size (N, 2), self_radius (N,), start_xy (N, 2), target_xy (N, 2)
+    '''
+    cfg = ScenarioCfg() if (cfg is None) else cfg
+    os.makedirs(bank_dir, exist_ok=True)
+    map_w, map_h = cfg.map_size
+    n_chunks = (num_scenarios + _GEN_CHUNK - 1) // _GEN_CHUNK
+    chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks + 1)
+
+    counts = np.random.default_rng(chunk_seeds[-1]).integers(
+        cfg.num_obstacles[0], cfg.num_obstacles[1] + 1, num_scenarios,
+    )
+    offsets = np.zeros(num_scenarios + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    num_obs_total = int(offsets[-1])
+
+    arrs = {
+        "centers": _open_for_write(bank_dir, "centers", (num_obs_total, 2), np.float64),
+        "widths": _open_for_write(bank_dir, "widths", (num_obs_total,), np.float64),
+        "angles": _open_for_write(bank_dir, "angles", (num_obs_total,), np.float64),
+    }
+    for chunk_idx in range(n_chunks):
+        rng = np.random.default_rng(chunk_seeds[chunk_idx])
+        st = offsets[chunk_idx * _GEN_CHUNK]
+        en = offsets[min((chunk_idx + 1) * _GEN_CHUNK, num_scenarios)]
+        m = en - st
+        arrs["centers"][st:en] = rng.uniform(*cfg.center_range, (m, 2)) * np.array([map_w, map_h])
+        arrs["widths"][st:en] = rng.uniform(*cfg.width_range, m) * min(map_w, map_h)
+        arrs["angles"][st:en] = rng.random(m)
+    for arr in arrs.values():
+        arr.flush()
+    del arrs
+
+    np.save(os.path.join(bank_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(bank_dir, "map_size.npy"), np.tile(np.array(cfg.map_size, dtype=np.float64), (num_scenarios, 1)))
+    np.save(os.path.join(bank_dir, "self_radius.npy"), np.full(num_scenarios, cfg.self_radius))
+    np.save(os.path.join(bank_dir, "start_xy.npy"), np.tile(np.array(cfg.start_xy, dtype=np.float64), (num_scenarios, 1)))
+    np.save(os.path.join(bank_dir, "target_xy.npy"), np.tile(np.array(cfg.target_xy, dtype=np.float64), (num_scenarios, 1)))
+    with open(os.path.join(bank_dir, "meta.json"), "w") as f:
+        json.dump({"num_scenarios": num_scenarios, "seed": seed, "cfg": asdict(cfg)}, f)
+
+
+def sample_attributes(rng: np.random.Generator, cfg: Optional[ScenarioCfg] = None) -> Attributes:
+    '''
+    One map from the distribution of `generate_scenarios`, drawn from `rng` instead of written to a bank.
+    '''
+    cfg = ScenarioCfg() if (cfg is None) else cfg
+    map_w, map_h = cfg.map_size
+    num_obs = int(rng.integers(cfg.num_obstacles[0], cfg.num_obstacles[1] + 1))
+    centers = rng.uniform(*cfg.center_range, (num_obs, 2)) * np.array([map_w, map_h])
+    widths = rng.uniform(*cfg.width_range, num_obs) * min(map_w, map_h)
+    angles = rng.random(num_obs)
+    attr = Attributes(
+        map_size=cfg.map_size,
+        self_radius=cfg.self_radius,
+        obstacles=[
+            SquareObstacle(center_xy=tuple(center), width=width, angle=angle)
+            for center, width, angle in zip(centers.tolist(), widths.tolist(), angles.tolist())
+        ],
+        start_xy=cfg.start_xy,
+        target_xy=cfg.target_xy,
+    )
+    attr._obs_arrs = ObstacleArrays.from_params(centers, widths, angles)
+    return attr
+
+
+def _open_for_write(bank_dir: str, name: str, shape: Tuple[int, ...], dtype) -> np.memmap:
+    return np.lib.format.open_memmap(os.path.join(bank_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+
+
+class ScenarioBank:
+    '''
+    Read-only view of a bank written by `generate_scenarios`.
+    Arrays are memory-mapped, so opening is O(1) and forked/spawned workers share the page cache.
+    '''
+    def __init__(self, bank_dir: str, mmap: bool = True):
+        self.bank_dir = bank_dir
+        mmap_mode = "r" if mmap else None
+        for name in _PER_OBS_FIELDS + _PER_MAP_FIELDS:
+            setattr(self, name, np.load(os.path.join(bank_dir, f"{name}.npy"), mmap_mode=mmap_mode))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_obstacle_params(self, idx: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        @return: (centers (K, 2), widths (K,), angles (K,))
+        '''
+        st, en = self.offsets[idx], self.offsets[idx + 1]
+        return np.asarray(self.centers[st:en]), np.asarray(self.widths[st:en]), np.asarray(self.angles[st:en])
+
+    def get_attributes(self, idx: int) -> Attributes:
+        if not (0 <= idx < len(self)):
+            raise IndexError(f"{idx=}, {len(self)=}")
+        centers, widths, angles = self.get_obstacle_params(idx)
+        attr = Attributes(
+            map_size=tuple(self.map_size[idx].tolist()),
+            self_radius=float(self.self_radius[idx]),
+            obstacles=[
+                SquareObstacle(center_xy=tuple(center), width=width, angle=angle)
+                for center, width, angle in zip(centers.tolist(), widths.tolist(), angles.tolist())
+            ],
+            start_xy=tuple(self.start_xy[idx].tolist()),
+            target_xy=tuple(self.target_xy[idx].tolist()),
+        )
+        attr._obs_arrs = ObstacleArrays.from_params(centers, widths, angles)
+        return attr
+
+    def get_padded_params(self, idxs: Sequence[int]):
+        '''
+        @return: (centers (N, K, 2), widths (N, K), angles (N, K), obs_mask (N, K)), K being the largest count in `idxs`
+        '''
+        idxs = np.asarray(idxs, dtype=np.int64)
+        starts = self.offsets[idxs]
+        counts = self.offsets[idxs + 1] - starts
+        k_max = int(counts.max(initial=0))
+        obs_mask = np.arange(k_max)[None, :] < counts[:, None]
+        gather = np.where(obs_mask, starts[:, None] + np.arange(k_max)[None, :], 0)
+        centers = np.where(obs_mask[..., None], self.centers[gather.ravel()].reshape(len(idxs), k_max, 2), 0.0)
+        widths = np.where(obs_mask, self.widths[gather.ravel()].reshape(len(idxs), k_max), 0.0)
+        angles = np.where(obs_mask, self.angles[gather.ravel()].reshape(len(idxs), k_max), 0.0)
+        return centers, widths, angles, obs_mask
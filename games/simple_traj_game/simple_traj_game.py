@@ -1,42 +1,95 @@
+import math
 import random
 
-import matplotlib.pyplot as plt
-from shapely import Polygon, Point, union_all, MultiPolygon, overlaps
+import numpy as np
 
 from .data_cls import Attributes, Answer, SquareObstacle, AnsEval
 from .utils import interp, get_square_vertices, combination, extend_line
+from .collision import HitEngine, ObstacleArrays, calc_hit_masks, calc_hit_rows_dense, hit_masks_to_records
+from .spatial_index import BROAD_PHASE_MIN_PAIRS, ObstacleGrid, calc_hit_pairs, calc_hit_rows, find_first_hit
+from .clearance import ClearanceField, build_clearance_field, square_sdf
+from .raster import rasterize
+from .scenario_bank import ScenarioBank
+from .eval_cache import EvalCache, map_content_key
 
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Sequence, TYPE_CHECKING
 
+# matplotlib and shapely take most of the import time of this package, yet only rendering and the shapely
+# reference engine need them: they are imported on first use, which keeps worker processes quick to start
+if TYPE_CHECKING:
+    from shapely import Polygon
 
-class Game:
-    def __init__(self):
-        map_h = 1.0
-        map_w = 1.0
-        self_size = 0.03
-
-        self.attr = Attributes(
-            map_size=(1.0, 1.0),
-            self_radius=self_size,
-            obstacles=[SquareObstacle(
-                center_xy=(
-                    interp(random.random(), (0.0, 1.0), (map_w * 0.2, map_w * 0.8)),
-                    interp(random.random(), (0.0, 1.0), (map_h * 0.2, map_h * 0.8))
-                ),
-                width=interp(random.random(), (0.0, 1.0), (min(map_w, map_h) * 0.05, min(map_w, map_h) * 0.15)),
-                angle=random.random(),
-            ) for _ in range(5)],
-            start_xy=(0.0, 0.0),
-            target_xy=(1.0, 1.0),
-        )
 
+# segments per quarter circle of `Point.buffer`, shapely's default
+SHAPELY_QUAD_SEGS = 16
+
+# cells along the longer map side of the cached signed-distance raster
+CLEARANCE_RESOLUTION = 512
+
+
+class Game:
+    def __init__(
+        self,
+        hit_engine: HitEngine = HitEngine.NUMPY,
+        attr: Optional[Attributes] = None,
+        eval_cache: Optional[EvalCache] = None,
+    ):
+        '''
+        @param: attr
+            use a given map instead of generating a random one
+        @param: eval_cache
+            memoizes `evaluate_ans` and shares the obstacle geometry with the other games of the same map
+        '''
+        self.hit_engine = HitEngine(hit_engine)
         self.ans: Optional[Answer] = None
+        self.eval_cache = eval_cache
+
+        if attr is None:
+            attr = _random_attributes()
+        if eval_cache is not None:
+            self._map_key = map_content_key(attr)
+            attr = eval_cache.share_map(self._map_key, attr)
+        self.attr = attr
+
+    @classmethod
+    def from_bank(
+        cls,
+        bank: ScenarioBank,
+        idx: int,
+        hit_engine: HitEngine = HitEngine.NUMPY,
+        eval_cache: Optional[EvalCache] = None,
+    ) -> "Game":
+        return cls(hit_engine=hit_engine, attr=bank.get_attributes(idx), eval_cache=eval_cache)
 
     def get_attributes(self) -> Attributes:
         return self.attr
 
+    def render_array(self, height: int = 64, width: int = 64, channels: int = 3) -> np.ndarray:
+        '''
+        Headless occupancy observation of obstacles, trajectory and start/target, see `raster.rasterize`.
+        @return: (height, width, channels) uint8
+        '''
+        trajs = None if (self.ans is None) else np.asarray(self.ans.traj, dtype=np.float64).reshape(1, -1, 2)
+        return rasterize(
+            self._get_obs_arrs().take(np.newaxis),  # batch of 1
+            obs_mask=np.ones((1, len(self.attr.obstacles)), dtype=bool),
+            self_radius=np.array([self.attr.self_radius]),
+            map_size=np.array([self.attr.map_size], dtype=np.float64),
+            start_xy=np.array([self.attr.start_xy], dtype=np.float64),
+            target_xy=np.array([self.attr.target_xy], dtype=np.float64),
+            trajs=trajs,
+            height=height,
+            width=width,
+            channels=channels,
+        )[0]
+
     def render_img(self, output_path: str):
-        plt.figure(figsize=(10.0, 10.0))
+        '''
+        Human-facing debug image; use `render_array` for observations.
+        '''
+        import matplotlib.pyplot as plt
+
+        fig = plt.figure(figsize=(10.0, 10.0))
 
         # obstacles
         vs_x = []
@@ -57,53 +110,284 @@ class Game:
 
         plt.axis((0.0, self.attr.map_size[0], 0.0, self.attr.map_size[1]))
         plt.savefig(output_path)
+        plt.close(fig)
 
     def apply_answer(self, ans: Answer):
         self.ans = ans
 
+    def clearance(self, xy: np.ndarray, resolution: int = CLEARANCE_RESOLUTION) -> np.ndarray:
+        '''
+        Signed distance from each point (..., 2) to the obstacles (negative inside), bilinear on a cached raster.
+        Subtract `attr.self_radius` for the clearance of the agent's body.
+        '''
+        return self._get_clearance_field(resolution).query(xy)
+
+    def clearance_grad(self, xy: np.ndarray, resolution: int = CLEARANCE_RESOLUTION) -> np.ndarray:
+        '''
+        Gradient (..., 2) of `clearance` w.r.t. each point.
+        '''
+        return self._get_clearance_field(resolution).grad(xy)
+
+    def move_waypoint(self, idx: int, xy: Tuple[float, float]):
+        '''
+        Move `ans.traj[idx]` to `xy`, refreshing caches of the vertex and its (up to) 2 paths only.
+        '''
+        traj = self._get_editable_traj()
+        t = len(traj)
+        _check_waypoint_idx(idx, t - 1)
+        traj[idx] = xy
+        self._splice_traj_caches(
+            traj,
+            vs_range=(idx, idx + 1, idx + 1),
+            paths_range=(max(idx - 1, 0), min(idx + 1, t - 1), min(idx + 1, t - 1)),
+        )
+
+    def insert_waypoint(self, idx: int, xy: Tuple[float, float]):
+        '''
+        Insert `xy` so that it becomes `ans.traj[idx]`; the path it splits is replaced by 2 new ones.
+        '''
+        traj = self._get_editable_traj()
+        t = len(traj)
+        _check_waypoint_idx(idx, t)
+        traj = np.insert(traj, idx, xy, axis=0)
+        self._splice_traj_caches(
+            traj,
+            vs_range=(idx, idx, idx + 1),
+            paths_range=(max(idx - 1, 0), max(min(idx, t - 1), 0), min(idx + 1, t)),
+        )
+
+    def delete_waypoint(self, idx: int):
+        '''
+        Delete `ans.traj[idx]`; its 2 paths are replaced by 1 path joining the neighbors.
+        '''
+        traj = self._get_editable_traj()
+        t = len(traj)
+        _check_waypoint_idx(idx, t - 1)
+        traj = np.delete(traj, idx, axis=0)
+        self._splice_traj_caches(
+            traj,
+            vs_range=(idx, idx + 1, idx),
+            paths_range=(max(idx - 1, 0), max(min(idx + 1, t - 1), 0), max(min(idx, t - 2), 0)),
+        )
+
     def evaluate_ans(self) -> AnsEval:
         if self.ans is None:
             raise ValueError("No answer yet!")
 
+        if self.eval_cache is not None:
+            key = self.eval_cache.key(self._map_key, self.hit_engine, self.ans.traj)
+            ans_eval = self.eval_cache.get(key)
+            if ans_eval is None:
+                ans_eval = self._evaluate_ans()
+                self.eval_cache.put(key, ans_eval)
+            return ans_eval
+        return self._evaluate_ans()
+
+    def _evaluate_ans(self) -> AnsEval:
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+
         return AnsEval(
-            hit_infos=self._calc_hit_infos(),
+            hit_records=self._calc_hit_records(),
+            traj_len=len(self.ans.traj),
         )
 
-    def _calc_hit_infos(self) -> List[Tuple[Tuple[int, int], int]]:
+    def is_feasible(self, ans: Optional[Answer] = None) -> bool:
+        '''
+        Whether `ans` (default: the applied answer) is collision-free; stops at the first hit.
+        '''
+        return self.first_hit(ans) is None
+
+    def first_hit(self, ans: Optional[Answer] = None) -> Optional[Tuple[Tuple[int, int], int]]:
+        '''
+        First hit in path order (vertex 0, path (0, 1), vertex 1, ...) of `ans` (default: the applied answer),
+        without evaluating the pieces after it.
+        @return: ((traj_idx_start, traj_idx_end), obstacle_idx), or `None` if collision-free
+        '''
+        if ans is None:
+            ans = self.ans
+        if ans is None:
+            raise ValueError("No answer yet!")
+
+        if self._has_hit_masks(ans):
+            return _first_hit_from_masks(ans._vs_hits, ans._paths_hits)
+
+        traj = np.asarray(ans.traj, dtype=np.float64).reshape(-1, 2)
+        return find_first_hit(traj, self.attr.self_radius, self._get_obs_arrs(), self._get_obs_grid())
+
+    def _calc_hit_records(self) -> np.ndarray:
         '''
-        @return: [((traj_idx_start, traj_idx_end), obstacle_idx)]
+        @return: HIT_RECORD_DTYPE array of (traj_idx_start, traj_idx_end, obstacle_idx)
         '''
         if self.ans is None:
             raise ValueError("No answer yet!")
 
+        if self.hit_engine == HitEngine.NUMPY:
+            return hit_masks_to_records(*self._get_hit_masks())
+        if self.hit_engine == HitEngine.SHAPELY:
+            return AnsEval.from_hit_infos(self._calc_hit_infos_shapely()).hit_records
+
+        hits_np = AnsEval(hit_masks_to_records(*self._get_hit_masks()))
+        hits_shp = AnsEval.from_hit_infos(self._calc_hit_infos_shapely())
+        if hits_np != hits_shp:
+            only_np = set(hits_np.hit_infos) - set(hits_shp.hit_infos)
+            only_shp = set(hits_shp.hit_infos) - set(hits_np.hit_infos)
+            only_np = {hit for hit in only_np if not self._in_buffer_approx_band(hit)}
+            if only_np or only_shp:
+                raise RuntimeError(
+                    f"numpy/shapely mismatch: only_numpy={sorted(only_np)}, only_shapely={sorted(only_shp)}"
+                )
+        return hits_np.hit_records
+
+    def _in_buffer_approx_band(self, hit: Tuple[Tuple[int, int], int]) -> bool:
+        '''
+        shapely's buffered disc is a polygon inscribed in the circle, so vertices within
+        r * (1 - cos(pi / (4 * quad_segs))) of the circle only hit analytically.
+        '''
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+        (idx_st, idx_en), idx_obs = hit
+        if idx_st != idx_en:
+            return False
+        obs = self._get_obs_arrs()
+        dist = square_sdf(self.ans.traj[idx_st], obs.centers[idx_obs], obs.half_widths[idx_obs], obs.cos_sin[idx_obs])
+        return dist >= self.attr.self_radius * math.cos(math.pi / (4 * SHAPELY_QUAD_SEGS))
+
+    def _has_hit_masks(self, ans: Answer) -> bool:
+        '''
+        Whether `ans` caches hit masks against this map; an answer may be applied to several games in turn.
+        '''
+        return (ans._hits_attr is self.attr) and (ans._vs_hits is not None) and (ans._paths_hits is not None)
+
+    def _get_hit_masks(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        @return: (vertex_hits (T, K), path_hits (T-1, K))
+        '''
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+        if not self._has_hit_masks(self.ans):
+            traj = np.asarray(self.ans.traj, dtype=np.float64).reshape(-1, 2)
+            obs_arrs = self._get_obs_arrs()
+            if len(traj) * len(obs_arrs) < BROAD_PHASE_MIN_PAIRS:
+                vs_hits, paths_hits = calc_hit_masks(traj, self.attr.self_radius, obs_arrs)
+            else:
+                vs_tr, vs_obs, paths_tr, paths_obs = calc_hit_pairs(
+                    traj, self.attr.self_radius, obs_arrs, self._get_obs_grid(),
+                )
+                vs_hits = np.zeros((len(traj), len(obs_arrs)), dtype=bool)
+                vs_hits[vs_tr, vs_obs] = True
+                paths_hits = np.zeros((max(len(traj) - 1, 0), len(obs_arrs)), dtype=bool)
+                paths_hits[paths_tr, paths_obs] = True
+            self.ans._vs_hits = vs_hits
+            self.ans._paths_hits = paths_hits
+            self.ans._hits_attr = self.attr
+        return self.ans._vs_hits, self.ans._paths_hits
+
+    def _get_editable_traj(self) -> np.ndarray:
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+        traj = self.ans.traj
+        if traj.dtype != np.float64:
+            # edits are in float64, so the first one converts a float32 traj
+            traj = np.array(traj, dtype=np.float64)
+            self.ans._replace_traj(traj)
+        return traj
+
+    def _splice_traj_caches(
+        self,
+        traj: np.ndarray,
+        vs_range: Tuple[int, int, int],
+        paths_range: Tuple[int, int, int],
+    ):
+        '''
+        Replace `ans.traj` by `traj` and update each existing cache piecewise.
+        @param: vs_range, paths_range
+            (start, old_end, new_end): old pieces [start, old_end) are replaced by new pieces [start, new_end)
+        '''
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+        ans = self.ans
+        ans._replace_traj(traj)
+        ans._union_plgs = None
+
+        vs_st, vs_en_old, vs_en_new = vs_range
+        paths_st, paths_en_old, paths_en_new = paths_range
+        vs_idxs = np.arange(vs_st, vs_en_new)
+        paths_idxs = np.arange(paths_st, paths_en_new)
+
+        if not self._has_hit_masks(ans):
+            ans.clear_hit_caches()  # masks of another map, if any, are useless here
+        else:
+            obs_arrs = self._get_obs_arrs()
+            if (len(vs_idxs) + len(paths_idxs)) * len(obs_arrs) < BROAD_PHASE_MIN_PAIRS:
+                vs_hits, paths_hits = calc_hit_rows_dense(traj, self.attr.self_radius, obs_arrs, vs_idxs, paths_idxs)
+            else:
+                vs_hits, paths_hits = calc_hit_rows(
+                    traj, self.attr.self_radius, obs_arrs, self._get_obs_grid(), vs_idxs, paths_idxs,
+                )
+            ans._vs_hits = _splice(ans._vs_hits, vs_st, vs_en_old, vs_hits)
+            ans._paths_hits = _splice(ans._paths_hits, paths_st, paths_en_old, paths_hits)
+
+        if (ans._vs_plgs is not None) or (ans._paths_plgs is not None):
+            from shapely import Point, Polygon
+        if ans._vs_plgs is not None:
+            ans._vs_plgs = _splice(ans._vs_plgs, vs_st, vs_en_old, [
+                Point(traj[idx]).buffer(self.attr.self_radius, quad_segs=SHAPELY_QUAD_SEGS) for idx in vs_idxs
+            ])
+        if ans._paths_plgs is not None:
+            ans._paths_plgs = _splice(ans._paths_plgs, paths_st, paths_en_old, [
+                Polygon(extend_line(traj[idx], traj[idx+1], radius=self.attr.self_radius)) for idx in paths_idxs
+            ])
+
+    def _calc_hit_infos_shapely(self) -> List[Tuple[Tuple[int, int], int]]:
+        if self.ans is None:
+            raise ValueError("No answer yet!")
+
         hits: List[Tuple[Tuple[int, int], int]] = []
 
         # vertices hit
         for (idx_tr, tr_geo), (idx_obs, obs_geo) in combination(
             self._get_traj_ver_plgs(), self._get_obs_plgs(), with_idx=True,
         ):
-            if overlaps(obs_geo, tr_geo):
+            if _interiors_intersect(obs_geo, tr_geo):
                 hits.append(((idx_tr, idx_tr), idx_obs))
         
         # traj_paths hit
         for (idx_tr, tr_geo), (idx_obs, obs_geo) in combination(
             self._get_traj_path_plgs(), self._get_obs_plgs(), with_idx=True,
         ):
-            if overlaps(obs_geo, tr_geo):
+            if _interiors_intersect(obs_geo, tr_geo):
                 hits.append(((idx_tr, idx_tr+1), idx_obs))
 
         return hits
 
-    def _get_obs_plgs(self) -> List[Polygon]:
+    def _get_obs_plgs(self) -> List["Polygon"]:
         if self.attr._obs_plgs is None:
+            from shapely import Polygon
             self.attr._obs_plgs = [
                 Polygon(get_square_vertices(obs.center_xy, obs.width, obs.angle))
                 for obs in self.attr.obstacles
             ]
         return self.attr._obs_plgs
 
-    def _get_obs_union_plg(self) -> List[Polygon]:
+    def _get_obs_arrs(self) -> ObstacleArrays:
+        if self.attr._obs_arrs is None:
+            self.attr._obs_arrs = ObstacleArrays.from_obstacles(self.attr.obstacles)
+        return self.attr._obs_arrs
+
+    def _get_obs_grid(self) -> ObstacleGrid:
+        if self.attr._obs_grid is None:
+            self.attr._obs_grid = ObstacleGrid(self._get_obs_arrs())
+        return self.attr._obs_grid
+
+    def _get_clearance_field(self, resolution: int) -> ClearanceField:
+        if (self.attr._obs_sdf is None) or (self.attr._obs_sdf.resolution != resolution):
+            self.attr._obs_sdf = build_clearance_field(self._get_obs_arrs(), self.attr.map_size, resolution)
+        return self.attr._obs_sdf
+
+    def _get_obs_union_plg(self) -> List["Polygon"]:
         if self.attr._obs_union_plgs is None:
+            from shapely import Polygon, MultiPolygon, union_all
             union_polygons = union_all(self._get_obs_plgs())
             if isinstance(union_polygons, MultiPolygon):
                 self.attr._obs_union_plgs = list(union_polygons.geoms)
@@ -113,27 +397,32 @@ class Game:
                 raise TypeError(f"{type(union_polygons)=}")
         return self.attr._obs_union_plgs
 
-    def _get_traj_ver_plgs(self) -> List[Polygon]:
+    def _get_traj_ver_plgs(self) -> List["Polygon"]:
         if self.ans is None:
             raise ValueError("No answer yet!")
         if self.ans._vs_plgs is None:
-            self.ans._vs_plgs = [Point(tr_xy).buffer(self.attr.self_radius) for tr_xy in self.ans.traj]
+            from shapely import Point
+            self.ans._vs_plgs = [
+                Point(tr_xy).buffer(self.attr.self_radius, quad_segs=SHAPELY_QUAD_SEGS) for tr_xy in self.ans.traj
+            ]
         return self.ans._vs_plgs
 
-    def _get_traj_path_plgs(self) -> List[Polygon]:
+    def _get_traj_path_plgs(self) -> List["Polygon"]:
         if self.ans is None:
             raise ValueError("No answer yet!")
         if self.ans._paths_plgs is None:
+            from shapely import Polygon
             self.ans._paths_plgs = [
                 Polygon(extend_line(self.ans.traj[idx], self.ans.traj[idx+1], radius=self.attr.self_radius))
                 for idx in range(len(self.ans.traj) - 1)
             ]
         return self.ans._paths_plgs
 
-    def _get_traj_union_plgs(self) -> List[Polygon]:
+    def _get_traj_union_plgs(self) -> List["Polygon"]:
         if self.ans is None:
             raise ValueError("No answer yet!")
         if self.ans._union_plgs is None:
+            from shapely import Polygon, MultiPolygon, union_all
             union_polygons = union_all(self._get_traj_ver_plgs() + self._get_traj_path_plgs())
             if isinstance(union_polygons, MultiPolygon):
                 self.ans._union_plgs = list(union_polygons.geoms)
@@ -142,3 +431,60 @@ class Game:
             else:
                 raise TypeError(f"{type(union_polygons)=}")
         return self.ans._union_plgs
+
+
+def _random_attributes() -> Attributes:
+    map_h = 1.0
+    map_w = 1.0
+    self_size = 0.03
+
+    return Attributes(
+        map_size=(1.0, 1.0),
+        self_radius=self_size,
+        obstacles=[SquareObstacle(
+            center_xy=(
+                interp(random.random(), (0.0, 1.0), (map_w * 0.2, map_w * 0.8)),
+                interp(random.random(), (0.0, 1.0), (map_h * 0.2, map_h * 0.8))
+            ),
+            width=interp(random.random(), (0.0, 1.0), (min(map_w, map_h) * 0.05, min(map_w, map_h) * 0.15)),
+            angle=random.random(),
+        ) for _ in range(5)],
+        start_xy=(0.0, 0.0),
+        target_xy=(1.0, 1.0),
+    )
+
+
+def _first_hit_from_masks(vs_hits: np.ndarray, paths_hits: np.ndarray) -> Optional[Tuple[Tuple[int, int], int]]:
+    vs_rows = np.flatnonzero(vs_hits.any(axis=1))
+    paths_rows = np.flatnonzero(paths_hits.any(axis=1))
+    # vertex i comes before path (j, j+1) iff i <= j
+    if len(vs_rows) and ((len(paths_rows) == 0) or (vs_rows[0] <= paths_rows[0])):
+        idx_tr = int(vs_rows[0])
+        return ((idx_tr, idx_tr), int(vs_hits[idx_tr].argmax()))
+    if len(paths_rows):
+        idx_tr = int(paths_rows[0])
+        return ((idx_tr, idx_tr + 1), int(paths_hits[idx_tr].argmax()))
+    return None
+
+
+def _check_waypoint_idx(idx: int, max_idx: int):
+    if not (0 <= idx <= max_idx):
+        raise IndexError(f"{idx=}, valid range is [0, {max_idx}]")
+
+
+def _splice(seq: Sequence, st: int, en: int, items: Sequence):
+    '''
+    `seq[st:en] = items` for lists and arrays; same-length replacements of arrays happen in place.
+    '''
+    if isinstance(seq, np.ndarray):
+        if (en - st) == len(items):
+            seq[st:en] = items
+            return seq
+        return np.concatenate([seq[:st], items, seq[en:]], axis=0)
+    return seq[:st] + list(items) + seq[en:]
+
+
+def _interiors_intersect(geo0: "Polygon", geo1: "Polygon") -> bool:
+    from shapely import intersects, touches
+    # unlike `overlaps`, this also counts a piece fully inside an obstacle (and vice versa)
+    return intersects(geo0, geo1) and not touches(geo0, geo1)
@@ -0,0 +1,215 @@
+import numpy as np
+
+from .collision import ObstacleArrays, disc_square_hits, segment_square_hits
+
+from typing import Optional, Tuple
+
+
+# below this many (piece, obstacle) pairs, dense tests beat building/querying the grid
+BROAD_PHASE_MIN_PAIRS = 4096
+
+
+def _expand_ranges(ranges: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    @param: ranges
+        (P, 4) inclusive integer boxes (ix0, iy0, ix1, iy1)
+    @return: (item_idxs, ixs, iys), one entry per covered cell
+    '''
+    ws = ranges[:, 2] - ranges[:, 0] + 1
+    cnts = ws * (ranges[:, 3] - ranges[:, 1] + 1)
+    item_idxs = np.repeat(np.arange(len(ranges)), cnts)
+    offs = np.arange(item_idxs.size) - np.repeat(np.cumsum(cnts) - cnts, cnts)
+    ws = ws[item_idxs]
+    return item_idxs, ranges[item_idxs, 0] + offs % ws, ranges[item_idxs, 1] + offs // ws
+
+
+def _expand_csr(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    @return: (item_idxs, positions), flattening [starts[i], ends[i]) for every i
+    '''
+    cnts = ends - starts
+    item_idxs = np.repeat(np.arange(len(starts)), cnts)
+    offs = np.arange(item_idxs.size) - np.repeat(np.cumsum(cnts) - cnts, cnts)
+    return item_idxs, starts[item_idxs] + offs
+
+
+class ObstacleGrid:
+    '''
+    Uniform grid over obstacle bounding boxes, stored as CSR (`cell_starts`, `cell_obs_idxs`).
+    Used as the broad phase: only (piece, obstacle) pairs sharing a cell and an overlapping AABB go to the exact test.
+    '''
+    def __init__(self, obs: ObstacleArrays, cell_size: Optional[float] = None, max_cells_per_axis: int = 256):
+        xs = obs.vertices[..., 0]
+        ys = obs.vertices[..., 1]
+        self.obs_aabbs = np.stack([xs.min(axis=1), ys.min(axis=1), xs.max(axis=1), ys.max(axis=1)], axis=1)  # (K, 4)
+        self.num_obs = len(obs)
+
+        if self.num_obs == 0:
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0
+            self.num_cells = np.ones(2, dtype=np.int64)
+            self.cell_starts = np.zeros(2, dtype=np.int64)
+            self.cell_obs_idxs = np.zeros(0, dtype=np.int64)
+            return
+
+        self.origin = self.obs_aabbs[:, :2].min(axis=0)
+        extent = np.maximum(self.obs_aabbs[:, 2:].max(axis=0) - self.origin, 1e-12)
+        if cell_size is None:
+            cell_size = float(np.median(self.obs_aabbs[:, 2:] - self.obs_aabbs[:, :2]))
+        cell_size = max(cell_size, float(extent.max()) / max_cells_per_axis, 1e-12)
+        self.cell_size = cell_size
+        self.num_cells = np.minimum(np.ceil(extent / cell_size).astype(np.int64), max_cells_per_axis).clip(1)
+
+        obs_idxs, ixs, iys = _expand_ranges(self._to_cell_ranges(self.obs_aabbs))
+        cells = iys * self.num_cells[0] + ixs
+        order = np.argsort(cells, kind="stable")
+        self.cell_obs_idxs = obs_idxs[order]
+        self.cell_starts = np.zeros(self.num_cells.prod() + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.num_cells.prod()), out=self.cell_starts[1:])
+
+    def _to_cell_ranges(self, aabbs: np.ndarray) -> np.ndarray:
+        lo = np.floor((aabbs[:, :2] - self.origin) / self.cell_size).astype(np.int64)
+        hi = np.floor((aabbs[:, 2:] - self.origin) / self.cell_size).astype(np.int64)
+        return np.concatenate([
+            np.clip(lo, 0, self.num_cells - 1),
+            np.clip(hi, 0, self.num_cells - 1),
+        ], axis=1)
+
+    def query(self, aabbs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        @param: aabbs
+            (P, 4) piece boxes (x_min, y_min, x_max, y_max)
+        @return: (piece_idxs, obs_idxs), unique candidate pairs sorted by (piece_idx, obs_idx)
+        '''
+        aabbs = np.asarray(aabbs, dtype=np.float64).reshape(-1, 4)
+        grid_max = self.origin + self.num_cells * self.cell_size
+        in_grid = np.nonzero(
+            (aabbs[:, 2] >= self.origin[0]) & (aabbs[:, 0] <= grid_max[0])
+            & (aabbs[:, 3] >= self.origin[1]) & (aabbs[:, 1] <= grid_max[1])
+        )[0]
+        if (self.num_obs == 0) or (in_grid.size == 0):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        rep_idxs, ixs, iys = _expand_ranges(self._to_cell_ranges(aabbs[in_grid]))
+        cells = iys * self.num_cells[0] + ixs
+        rep_idxs2, positions = _expand_csr(self.cell_starts[cells], self.cell_starts[cells + 1])
+        keys = np.unique(in_grid[rep_idxs[rep_idxs2]] * self.num_obs + self.cell_obs_idxs[positions])
+        piece_idxs = keys // self.num_obs
+        obs_idxs = keys % self.num_obs
+
+        # exact AABB rejection
+        keep = _aabbs_overlap(aabbs[piece_idxs], self.obs_aabbs[obs_idxs])
+        return piece_idxs[keep], obs_idxs[keep]
+
+
+def vertex_aabbs(traj: np.ndarray, radius: float) -> np.ndarray:
+    return np.concatenate([traj - radius, traj + radius], axis=1)
+
+
+def path_aabbs(traj: np.ndarray, radius: float) -> np.ndarray:
+    return segment_aabbs(traj[:-1], traj[1:], radius)
+
+
+def segment_aabbs(xy0: np.ndarray, xy1: np.ndarray, radius: float) -> np.ndarray:
+    return np.concatenate([np.minimum(xy0, xy1) - radius, np.maximum(xy0, xy1) + radius], axis=1)
+
+
+def calc_hit_pairs(traj: np.ndarray, radius: float, obs: ObstacleArrays, grid: ObstacleGrid):
+    '''
+    Broad phase through `grid`, then the exact kernels on the candidate pairs only.
+    @return: (vs_tr, vs_obs, paths_tr, paths_obs), sorted by (traj_idx, obstacle_idx)
+    '''
+    vs_tr, vs_obs = grid.query(vertex_aabbs(traj, radius))
+    vs_keep = disc_square_hits(
+        traj[vs_tr], radius, obs.centers[vs_obs], obs.half_widths[vs_obs], obs.cos_sin[vs_obs],
+    )
+
+    paths_tr, paths_obs = grid.query(path_aabbs(traj, radius))
+    paths_keep = segment_square_hits(
+        traj[paths_tr], traj[paths_tr + 1], radius,
+        obs.centers[paths_obs], obs.half_widths[paths_obs], obs.cos_sin[paths_obs],
+    )
+
+    return vs_tr[vs_keep], vs_obs[vs_keep], paths_tr[paths_keep], paths_obs[paths_keep]
+
+
+def calc_hit_rows(
+    traj: np.ndarray, radius: float, obs: ObstacleArrays, grid: ObstacleGrid,
+    vs_idxs: np.ndarray, paths_idxs: np.ndarray,
+):
+    '''
+    Hit masks of a subset of pieces only, for incremental updates.
+    @return: (vertex_hits (len(vs_idxs), K), path_hits (len(paths_idxs), K))
+    '''
+    vs_xy = traj[vs_idxs]
+    paths_xy0 = traj[paths_idxs]
+    paths_xy1 = traj[paths_idxs + 1]
+
+    vs_hits = np.zeros((len(vs_idxs), len(obs)), dtype=bool)
+    rows, cols = grid.query(vertex_aabbs(vs_xy, radius))
+    vs_hits[rows, cols] = disc_square_hits(
+        vs_xy[rows], radius, obs.centers[cols], obs.half_widths[cols], obs.cos_sin[cols],
+    )
+
+    paths_hits = np.zeros((len(paths_idxs), len(obs)), dtype=bool)
+    rows, cols = grid.query(segment_aabbs(paths_xy0, paths_xy1, radius))
+    paths_hits[rows, cols] = segment_square_hits(
+        paths_xy0[rows], paths_xy1[rows], radius, obs.centers[cols], obs.half_widths[cols], obs.cos_sin[cols],
+    )
+
+    return vs_hits, paths_hits
+
+
+def find_first_hit(
+    traj: np.ndarray, radius: float, obs: ObstacleArrays, grid: ObstacleGrid, min_chunk: int = 16,
+) -> Optional[Tuple[Tuple[int, int], int]]:
+    '''
+    Walk pieces in path order (vertex 0, path (0, 1), vertex 1, ...) in geometrically growing chunks,
+    rejecting by AABB before the exact test, and stop at the first chunk containing a hit.
+    @return: ((traj_idx_start, traj_idx_end), obstacle_idx), or `None` if collision-free
+    '''
+    t = len(traj)
+    k = len(obs)
+    st = 0
+    chunk = min_chunk
+    while st < t:
+        en = min(st + chunk, t)
+        vs_xy = traj[st:en]
+        paths_xy0 = traj[st:min(en, t - 1)]
+        paths_xy1 = traj[st + 1:min(en, t - 1) + 1]
+        vs_boxes = vertex_aabbs(vs_xy, radius)
+        paths_boxes = segment_aabbs(paths_xy0, paths_xy1, radius)
+
+        if (len(vs_boxes) + len(paths_boxes)) * k < BROAD_PHASE_MIN_PAIRS:
+            vs_rows, vs_cols = np.nonzero(_aabbs_overlap(vs_boxes[:, None], grid.obs_aabbs[None]))
+            paths_rows, paths_cols = np.nonzero(_aabbs_overlap(paths_boxes[:, None], grid.obs_aabbs[None]))
+        else:
+            vs_rows, vs_cols = grid.query(vs_boxes)
+            paths_rows, paths_cols = grid.query(paths_boxes)
+
+        vs_keep = disc_square_hits(
+            vs_xy[vs_rows], radius, obs.centers[vs_cols], obs.half_widths[vs_cols], obs.cos_sin[vs_cols],
+        )
+        paths_keep = segment_square_hits(
+            paths_xy0[paths_rows], paths_xy1[paths_rows], radius,
+            obs.centers[paths_cols], obs.half_widths[paths_cols], obs.cos_sin[paths_cols],
+        )
+        # path-order key: vertex i -> 2i, path (i, i+1) -> 2i+1; ties broken by obstacle idx
+        keys = np.concatenate([
+            (2 * (st + vs_rows[vs_keep])) * k + vs_cols[vs_keep],
+            (2 * (st + paths_rows[paths_keep]) + 1) * k + paths_cols[paths_keep],
+        ])
+        if keys.size > 0:
+            key = int(keys.min())
+            piece, obs_idx = divmod(key, k)
+            idx_tr = piece // 2
+            return ((idx_tr, idx_tr + piece % 2), obs_idx)
+
+        st = en
+        chunk *= 2
+    return None
+
+
+def _aabbs_overlap(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a[..., 0] < b[..., 2]) & (b[..., 0] < a[..., 2]) & (a[..., 1] < b[..., 3]) & (b[..., 1] < a[..., 3])
@@ -0,0 +1,74 @@
+import functools
+
+import numpy as np
+
+from mods.learning_workflow.data_list import DataList
+from mods.learning_workflow.executor import ActorLearnerExecutor
+from games.simple_traj_game import collect_rollouts, LineOffsetPolicy
+
+from typing import Any, Dict, Optional
+
+
+class TrajPlanExecutor(ActorLearnerExecutor):
+    '''
+    Cross-entropy method on a `LineOffsetPolicy`: actors roll the current policy out on fresh maps,
+    the learner refits the offsets to the elite trajectories (fewest hits, then shortest) of every batch.
+    '''
+    def __init__(
+        self,
+        num_waypoints: int = 8,
+        games_per_batch: int = 64,
+        elite_frac: float = 0.2,
+        smoothing: float = 0.5,
+        min_std: float = 0.05,
+        num_actors: int = 2,
+        batches_per_epoch: int = 16,
+        max_policy_lag: int = 2,
+        seed: int = 0,
+    ):
+        super().__init__(
+            actor_fn=functools.partial(collect_rollouts, num_games=games_per_batch),
+            num_actors=num_actors,
+            batches_per_epoch=batches_per_epoch,
+            max_policy_lag=max_policy_lag,
+            seed=seed,
+        )
+        self.policy = LineOffsetPolicy(offsets=np.zeros((num_waypoints - 2, 2)), std=0.2)
+        self.elite_frac = elite_frac
+        self.smoothing = smoothing
+        self.min_std = min_std  # keeps exploring instead of collapsing onto the first local optimum
+
+    def get_policy_snapshot(self) -> LineOffsetPolicy:
+        return LineOffsetPolicy(offsets=self.policy.offsets.copy(), std=self.policy.std)
+
+    def train_forward(self, data: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        trajs = data["trajs"]
+        lens = np.linalg.norm(np.diff(trajs, axis=1), axis=-1).sum(axis=1)
+        order = np.lexsort((lens, data["num_hits"]))
+        elites = trajs[order[:max(1, int(len(order) * self.elite_frac))]]
+        ts = np.linspace(0.0, 1.0, trajs.shape[1])[:, None]
+        lines = (1.0 - ts) * trajs[:, :1] + ts * trajs[:, -1:]
+        elite_offsets = (elites - lines[order[:len(elites)]])[:, 1:-1]
+        return {
+            "offsets": elite_offsets.mean(axis=0),
+            "std": float(elite_offsets.std(axis=0).mean()),
+            "hit_rate": float((data["num_hits"] > 0).mean()),
+        }
+
+    def learn(self, data: Dict[str, np.ndarray], forward_ret: Dict[str, Any]):
+        a = self.smoothing
+        self.policy.offsets = a * self.policy.offsets + (1.0 - a) * forward_ret["offsets"]
+        self.policy.std = max(a * self.policy.std + (1.0 - a) * forward_ret["std"], self.min_std)
+
+    def get_eval_datas(self) -> DataList:
+        return self.get_train_datas()
+
+    def eval_forward(self, data: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        return {"hit_rate": float((data["num_hits"] > 0).mean())}
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {**super().state_dict(), "offsets": self.policy.offsets, "std": self.policy.std}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.policy = LineOffsetPolicy(offsets=np.array(state["offsets"]), std=state["std"])
+        super().load_state_dict(state)
@@ -0,0 +1,105 @@
+import random
+import tempfile
+
+import numpy as np
+
+import games.simple_traj_game as traj_game
+import mods.learning_workflow as lw
+from mods.learning_workflow.executor import DummyExecutor
+from games.simple_traj_game._bench import random_attr, random_walk, timeit
+from mods.learning_workflow._bench import NoopWidget
+
+from typing import Callable, Dict, Iterator, Tuple
+
+
+# name -> (value, unit, higher_is_better)
+Result = Tuple[float, str, bool]
+
+
+def best_of(fn: Callable[[], None], min_dur: float = 0.2, repeats: int = 3) -> float:
+    '''
+    @return: seconds per call, best over `repeats` rounds of `timeit`
+    '''
+    return min(timeit(fn, min_dur) for _ in range(repeats))
+
+
+def bench_collision(quick: bool) -> Iterator[Tuple[str, Result]]:
+    rng = np.random.default_rng(0)
+    for num_obs in ([5, 50] if quick else [5, 50, 200]):
+        attr = random_attr(num_obs, rng)
+        for traj_len in ([10, 100] if quick else [10, 100, 1000]):
+            ans = traj_game.Answer(random_walk(traj_len, rng))
+            game = traj_game.Game(attr=attr)
+            game.apply_answer(ans)
+
+            def evaluate():
+                ans.clear_hit_caches()  # measure the evaluation, not the cache
+                game.evaluate_ans()
+
+            yield f"collision/evaluate_ans/obs{num_obs}_len{traj_len}", (best_of(evaluate) * 1e3, "ms", False)
+
+
+def bench_eval_cache(quick: bool) -> Iterator[Tuple[str, Result]]:
+    rng = np.random.default_rng(0)
+    attr = random_attr(50, rng)
+    ans = traj_game.Answer(random_walk(100, rng))
+    game = traj_game.Game(attr=attr, eval_cache=traj_game.EvalCache())
+    game.apply_answer(ans)
+    yield "eval_cache/evaluate_ans_hit/obs50_len100", (best_of(game.evaluate_ans) * 1e3, "ms", False)
+
+
+def bench_scenarios(quick: bool) -> Iterator[Tuple[str, Result]]:
+    num_maps = 20000 if quick else 200000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dur = best_of(lambda: traj_game.generate_scenarios(tmp_dir, num_maps, seed=0), min_dur=0.0)
+    yield "scenarios/generate", (num_maps / dur, "maps/s", True)
+
+
+def bench_render(quick: bool) -> Iterator[Tuple[str, Result]]:
+    import matplotlib
+    matplotlib.use("Agg")
+    game = traj_game.Game(attr=random_attr(5, np.random.default_rng(0)))
+    game.apply_answer(traj_game.Answer(random_walk(20, np.random.default_rng(1))))
+    yield "render/render_array", (best_of(game.render_array) * 1e3, "ms", False)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dur = best_of(lambda: game.render_img(f"{tmp_dir}/img.png"), min_dur=0.0, repeats=1 if quick else 3)
+    yield "render/render_img", (dur * 1e3, "ms", False)
+
+
+def bench_data_list(quick: bool) -> Iterator[Tuple[str, Result]]:
+    num_data = 20000 if quick else 100000
+    items = [np.zeros(16, dtype=np.float32) for _ in range(num_data)]
+    arr = np.zeros((num_data, 16), dtype=np.float32)
+    idx_order = list(range(num_data))
+    random.Random(0).shuffle(idx_order)
+    for batch_size in [1, 32, 256]:
+        data_lists: Dict[str, lw.DataList] = {
+            "DataList": lw.DataList(items, batch_size, idx_order),
+            "ArrayDataList": lw.ArrayDataList(arr, batch_size, idx_order),
+        }
+        for name, data_list in data_lists.items():
+            dur = best_of(lambda: [None for _ in data_list], min_dur=0.0)
+            yield f"data_list/{name}/bs{batch_size}", (len(data_list) / dur, "batches/s", True)
+
+
+def bench_pipeline(quick: bool) -> Iterator[Tuple[str, Result]]:
+    num_epochs = 500 if quick else 5000
+    num_its = num_epochs * len(DummyExecutor().get_train_datas())
+    for num_widgets in [0, 8, 32]:
+        def train():
+            pl = lw.Pipeline(lw.Cfg(num_epochs), DummyExecutor())
+            for _ in range(num_widgets):
+                pl.register(NoopWidget())
+            pl.train(0, num_epochs - 1)
+
+        yield f"pipeline/train_overhead/widgets{num_widgets}", (best_of(train, min_dur=0.0) / num_its * 1e6, "us/iter", False)
+
+
+SUITES = {
+    "collision": bench_collision,
+    "eval_cache": bench_eval_cache,
+    "scenarios": bench_scenarios,
+    "render": bench_render,
+    "data_list": bench_data_list,
+    "pipeline": bench_pipeline,
+}
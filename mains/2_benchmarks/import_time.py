@@ -0,0 +1,77 @@
+import sys
+sys.path.append("../..")
+import os
+import argparse
+import subprocess
+
+from typing import Dict, List, Tuple
+
+
+# cold import of each package, in ms; worker processes (data, eval, rollout) pay it on every start
+BUDGETS_MS = {
+    "games.simple_traj_game": 250.0,
+    "mods.learning_workflow": 250.0,
+}
+# must only be loaded on first use (rendering, shapely reference engine, progress bars)
+LAZY_MODULES = ["matplotlib", "shapely", "tqdm", "torch"]
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+def import_profile(module: str) -> Tuple[float, List[Tuple[str, float, float]], List[str]]:
+    '''
+    Import `module` in a fresh interpreter with `-X importtime`.
+    @return: (total ms, [(imported module, self ms, cumulative ms)], the `LAZY_MODULES` it loaded)
+    '''
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([_ROOT, os.environ.get("PYTHONPATH", "")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=_ROOT, env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1e3, int(cum_us) / 1e3))
+    total_ms = next(cum for name, _, cum in reversed(rows) if name == module)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total_ms, rows, loaded
+
+
+def best_import_ms(module: str, repeats: int = 3) -> float:
+    return min(import_profile(module)[0] for _ in range(repeats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of the core packages against a budget.")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per package")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every budget, for slower machines")
+    args = parser.parse_args()
+
+    num_failures = 0
+    for module, budget_ms in BUDGETS_MS.items():
+        budget_ms *= args.scale
+        total_ms, rows, loaded = import_profile(module)
+        if total_ms > budget_ms:
+            # a single run may be noisy; only the best of a few counts
+            total_ms = min(total_ms, best_import_ms(module))
+        ok = (total_ms <= budget_ms) and (len(loaded) == 0)
+        num_failures += 0 if ok else 1
+
+        print(f"{module}: {total_ms:.1f} ms (budget {budget_ms:.0f} ms) {'OK' if ok else 'FAIL'}")
+        if loaded:
+            print(f"  eagerly imports {', '.join(loaded)}")
+        for name, self_ms, cum_ms in sorted(rows, key=lambda row: -row[1])[:args.top]:
+            print(f"  {self_ms:>8.1f} self {cum_ms:>8.1f} cumulative  {name.strip()}")
+    sys.exit(1 if num_failures > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
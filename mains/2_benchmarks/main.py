@@ -0,0 +1,91 @@
+import sys
+sys.path.append("../..")
+import json
+import time
+import argparse
+import platform
+
+import numpy as np
+
+from cases import SUITES
+
+from typing import Any, Dict
+
+
+def run(suites, quick: bool) -> Dict[str, Any]:
+    results = {}
+    for suite in suites:
+        for name, (value, unit, higher_is_better) in SUITES[suite](quick):
+            print(f"{name:<48} {value:>14.3f} {unit}")
+            results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(base: Dict[str, Any], curr: Dict[str, Any], threshold: float) -> int:
+    '''
+    @return: number of regressions, i.e. results worse than the baseline by more than `threshold` (relative)
+    '''
+    if base["meta"].get("quick") != curr["meta"]["quick"]:
+        raise ValueError(
+            f"Baseline ran with quick={base['meta'].get('quick')}, this run with quick={curr['meta']['quick']}: "
+            f"sizes differ, so results are not comparable"
+        )
+    num_regressions = 0
+    print(f"{'benchmark':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, curr_res in curr["results"].items():
+        base_res = base["results"].get(name)
+        if base_res is None:
+            print(f"{name:<48} {'-':>12} {curr_res['value']:>12.3f}      new")
+            continue
+        change = curr_res["value"] / base_res["value"] - 1.0
+        worse = -change if curr_res["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            num_regressions += 1
+        print(f"{name:<48} {base_res['value']:>12.3f} {curr_res['value']:>12.3f} {change:>+8.1%}{flag}")
+    # e.g. a suite left out with `--suites`, or a renamed case
+    for name, base_res in base["results"].items():
+        if name not in curr["results"]:
+            print(f"{name:<48} {base_res['value']:>12.3f} {'-':>12}  missing")
+    return num_regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of game evaluation and workflow overhead.")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a smoke run")
+    parser.add_argument("--out", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare against; exits with 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    base = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            base = json.load(f)
+        # checked before spending minutes on a run that cannot be compared
+        if base["meta"].get("quick") != args.quick:
+            parser.error(f"{args.compare} ran with quick={base['meta'].get('quick')}, this run has quick={args.quick}")
+
+    curr = run(args.suites, args.quick)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(curr, f, indent=2)
+    if base is not None:
+        num_regressions = compare(base, curr, args.threshold)
+        print(f"{num_regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1 if num_regressions > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
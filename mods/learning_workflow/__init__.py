@@ -1,4 +1,6 @@
 from .pipeline import Pipeline
 from .executor import Executor
-from .data_list import DataList
+from .data_list import DataList, PrefetchDataList, ArrayDataList, BucketedDataList, ReplayBuffer
 from .data_cls import Cfg
+from .checkpoint import Checkpointer
+from .recaller import Schedule
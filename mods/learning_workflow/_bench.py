@@ -0,0 +1,71 @@
+import sys
+sys.path.append("../..")
+import time
+
+import mods.learning_workflow as lw
+from mods.learning_workflow.executor import Executor
+from mods.learning_workflow.widgets import WidgetsBase, Profiler
+
+
+NUM_ITERS = 100000
+NUM_WIDGETS = [0, 12, 48]
+
+
+class NoopExecutor(Executor):
+    def get_train_datas(self) -> lw.DataList:
+        return lw.DataList(range(NUM_ITERS), batch_size=1)
+
+    def train_forward(self, data):
+        return None
+
+    def step(self, data, forward_ret):
+        pass
+
+    def get_eval_datas(self) -> lw.DataList:
+        return self.get_train_datas()
+
+    def eval_forward(self, data):
+        return None
+
+
+class NoopWidget(WidgetsBase):
+    def on_train_iter_start(self, cfg, status, data_batch):
+        pass
+
+    def on_train_before_step(self, cfg, status, data_batch, forward_ret):
+        pass
+
+    def on_train_iter_end(self, cfg, status, data_batch, forward_ret):
+        pass
+
+
+def per_iter_us(num_widgets: int, schedule=None, profile: bool = False) -> float:
+    pl = lw.Pipeline(lw.Cfg(1), NoopExecutor())
+    if profile:
+        pl.register(Profiler(print_report=False))
+    for _ in range(num_widgets):
+        pl.register(NoopWidget(), schedule)
+    st = time.perf_counter()
+    pl.train(0, 0)
+    return (time.perf_counter() - st) / NUM_ITERS * 1e6
+
+
+def main():
+    # the bare loop over the same batches, subtracted to get the framework's own cost
+    st = time.perf_counter()
+    for _ in NoopExecutor().get_train_datas():
+        pass
+    base_us = (time.perf_counter() - st) / NUM_ITERS * 1e6
+
+    print(f"{'widgets':>7} {'schedule':>17} {'profiled':>8} {'overhead(us/iter)':>18}")
+    for num_widgets in NUM_WIDGETS:
+        for profile in [False, True]:
+            dur = per_iter_us(num_widgets, profile=profile) - base_us
+            print(f"{num_widgets:>7} {'every iter':>17} {profile!s:>8} {dur:>18.2f}")
+        if num_widgets > 0:
+            dur = per_iter_us(num_widgets, lw.Schedule(every_n_iters=100)) - base_us
+            print(f"{num_widgets:>7} {'every_n_iters=100':>17} {'False':>8} {dur:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
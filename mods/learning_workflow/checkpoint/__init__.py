@@ -0,0 +1,2 @@
+from .checkpointer import Checkpointer, load_ckpt
+from .rng_states import get_rng_states, set_rng_states
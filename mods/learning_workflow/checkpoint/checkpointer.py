@@ -0,0 +1,120 @@
+import os
+import re
+import pickle
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+_CKPT_NAME_RE = re.compile(r"^ckpt_ep(\d+)_it(\d+)(_end)?\.pkl$")
+
+
+class Checkpointer:
+    '''
+    Writes pipeline snapshots to `ckpt_dir` on a background thread.
+    Every file is written to a temporary name, fsync-ed and atomically renamed, so a crash never leaves a torn
+    checkpoint behind; `load_latest` always sees a complete one.
+    '''
+    def __init__(
+        self,
+        ckpt_dir: str,
+        every_n_epochs: Optional[int] = 1,
+        every_n_iters: Optional[int] = None,
+        keep_last: Optional[int] = 2,
+        keep_every_n_epochs: Optional[int] = None,
+        max_pending: int = 1,
+    ):
+        '''
+        @param: every_n_epochs, every_n_iters
+            save at the end of every n-th epoch / train iteration of an epoch, `None` to disable
+        @param: keep_last
+            number of most recent checkpoints to keep, `None` to keep all
+        @param: keep_every_n_epochs
+            additionally keep the end-of-epoch checkpoints of every n-th epoch
+        @param: max_pending
+            snapshots allowed to wait for the writer; beyond it, `save` blocks on the oldest (bounds memory)
+        '''
+        if max_pending < 1:
+            raise ValueError(f"{max_pending=}")
+        self.ckpt_dir = ckpt_dir
+        self.every_n_epochs = every_n_epochs
+        self.every_n_iters = every_n_iters
+        self.keep_last = keep_last
+        self.keep_every_n_epochs = keep_every_n_epochs
+        self.max_pending = max_pending
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="checkpoint")
+        self._pending: Deque[Future] = deque()
+        os.makedirs(ckpt_dir, exist_ok=True)
+
+    def should_save(self, ep_idx: int, it_idx: int, total_its: int) -> bool:
+        '''
+        Whether to save after train iteration `it_idx` of epoch `ep_idx` is done.
+        '''
+        if it_idx == total_its - 1:
+            return (self.every_n_epochs is not None) and ((ep_idx + 1) % self.every_n_epochs == 0)
+        return (self.every_n_iters is not None) and ((it_idx + 1) % self.every_n_iters == 0)
+
+    def save(self, ep_idx: int, it_idx: int, epoch_done: bool, snapshot: Dict[str, Any]):
+        '''
+        Queue `snapshot` for writing and return immediately. `snapshot` must not be mutated afterwards.
+        Errors of earlier writes are raised here.
+        '''
+        while self._pending and self._pending[0].done():
+            self._pending.popleft().result()
+        while len(self._pending) >= self.max_pending:
+            self._pending.popleft().result()
+        self._pending.append(self._writer.submit(self._write, ep_idx, it_idx, epoch_done, snapshot))
+
+    def flush(self):
+        '''
+        Wait for all queued snapshots to be on disk.
+        '''
+        while self._pending:
+            self._pending.popleft().result()
+
+    def close(self):
+        self.flush()
+        self._writer.shutdown(wait=True)
+
+    def list_ckpts(self) -> List[Tuple[int, int, bool, str]]:
+        '''
+        @return: (ep_idx, it_idx, epoch_done, path) of the checkpoints on disk, oldest first
+        '''
+        ckpts = []
+        for name in os.listdir(self.ckpt_dir):
+            match = _CKPT_NAME_RE.match(name)
+            if match is not None:
+                ckpts.append((int(match[1]), int(match[2]), match[3] is not None, os.path.join(self.ckpt_dir, name)))
+        return sorted(ckpts)
+
+    def load_latest(self) -> Optional[Dict[str, Any]]:
+        ckpts = self.list_ckpts()
+        return load_ckpt(ckpts[-1][-1]) if ckpts else None
+
+    def _write(self, ep_idx: int, it_idx: int, epoch_done: bool, snapshot: Dict[str, Any]):
+        suffix = "_end" if epoch_done else ""
+        path = os.path.join(self.ckpt_dir, f"ckpt_ep{ep_idx:05d}_it{it_idx:07d}{suffix}.pkl")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._apply_retention()
+
+    def _apply_retention(self):
+        if self.keep_last is None:
+            return
+        ckpts = self.list_ckpts()
+        keep = set(path for *_, path in ckpts[-self.keep_last:])
+        for ep_idx, _, epoch_done, path in ckpts:
+            if epoch_done and (self.keep_every_n_epochs is not None) and ((ep_idx + 1) % self.keep_every_n_epochs == 0):
+                continue
+            if path not in keep:
+                os.remove(path)
+
+
+def load_ckpt(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,32 @@
+import sys
+import random
+
+import numpy as np
+
+from typing import Any, Dict
+
+
+def get_rng_states() -> Dict[str, Any]:
+    '''
+    States of the global rngs: `random`, `numpy.random` and, if already imported, `torch`.
+    '''
+    states = {
+        "random": random.getstate(),
+        "numpy": np.random.get_state(),
+    }
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        states["torch"] = torch.get_rng_state()
+        if torch.cuda.is_available():
+            states["torch_cuda"] = torch.cuda.get_rng_state_all()
+    return states
+
+
+def set_rng_states(states: Dict[str, Any]):
+    random.setstate(states["random"])
+    np.random.set_state(states["numpy"])
+    torch = sys.modules.get("torch")
+    if (torch is not None) and ("torch" in states):
+        torch.set_rng_state(states["torch"])
+        if ("torch_cuda" in states) and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all(states["torch_cuda"])
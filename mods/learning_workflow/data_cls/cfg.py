@@ -1,6 +1,11 @@
 from dataclasses import dataclass
 
+from typing import Optional
+
 
 @dataclass
 class Cfg:
     total_train_epoch: int  # epoch counts as `range(total_train_epoch)`
+    eval_every_n_epochs: Optional[int] = None  # evaluate after every n-th train epoch, `None` for never
+    eval_in_subprocess: bool = True  # scheduled evals run on a snapshot in a worker process, overlapping training
+    eval_return_batches: bool = False  # the eval worker also sends the data batches back, else callbacks get `None`
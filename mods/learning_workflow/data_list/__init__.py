@@ -1 +1,5 @@
 from .data_list import DataList
+from .prefetch_data_list import PrefetchDataList
+from .array_data_list import ArrayDataList, ShardedArray
+from .bucketed_data_list import BucketedDataList, quantile_bucket_bounds
+from .replay_buffer import ReplayBuffer, SumTree
@@ -0,0 +1,111 @@
+import numpy as np
+
+from .data_list import DataList
+
+from typing import Sequence, Optional, Iterable, Union, Dict
+
+
+class ShardedArray:
+    '''
+    Read-only concatenation along axis 0 of several .npy files, each memory-mapped.
+    Only the rows actually indexed are read, so memory use does not grow with the dataset.
+    '''
+    def __init__(self, paths: Sequence[str]):
+        self.paths = list(paths)
+        self.shards = [np.load(path, mmap_mode="r") for path in self.paths]
+        if len(self.shards) == 0:
+            raise ValueError("No shard given!")
+        row_shape = self.shards[0].shape[1:]
+        dtype = self.shards[0].dtype
+        for path, shard in zip(self.paths, self.shards):
+            if shard.shape[1:] != row_shape or shard.dtype != dtype:
+                raise ValueError(f"{path}: {shard.shape=}, {shard.dtype=}, expected rows of {row_shape} {dtype}")
+        self.offsets = np.zeros(len(self.shards) + 1, dtype=np.int64)
+        np.cumsum([len(shard) for shard in self.shards], out=self.offsets[1:])
+        self.dtype = dtype
+        self.shape = (int(self.offsets[-1]), *row_shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            st, en, step = idx.indices(len(self))
+            shard_idx = int(np.searchsorted(self.offsets, st, side="right")) - 1
+            if step == 1 and st < en and en <= self.offsets[shard_idx + 1]:
+                # within one shard: a zero-copy view of the memmap
+                return self.shards[shard_idx][st - self.offsets[shard_idx]:en - self.offsets[shard_idx]]
+            return self.take(np.arange(st, en, step))
+        if np.ndim(idx) > 0:
+            return self.take(np.asarray(idx))
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        shard_idx = int(np.searchsorted(self.offsets, idx, side="right")) - 1
+        return self.shards[shard_idx][idx - self.offsets[shard_idx]]
+
+    def take(self, idxs: np.ndarray) -> np.ndarray:
+        '''
+        Gather rows into a new contiguous array; each shard is read once, in ascending row order.
+        '''
+        idxs = np.asarray(idxs, dtype=np.int64)
+        out = np.empty((len(idxs), *self.shape[1:]), dtype=self.dtype)
+        order = np.argsort(idxs, kind="stable")
+        sorted_idxs = idxs[order]
+        bounds = np.searchsorted(sorted_idxs, self.offsets)
+        for shard_idx, shard in enumerate(self.shards):
+            st, en = bounds[shard_idx], bounds[shard_idx + 1]
+            if st < en:
+                out[order[st:en]] = shard[sorted_idxs[st:en] - self.offsets[shard_idx]]
+        return out
+
+
+_ArrayLike = Union[np.ndarray, ShardedArray]
+
+
+class ArrayDataList(DataList):
+    '''
+    `DataList` over arrays (in-memory, `np.memmap` or `ShardedArray`), yielding batches as contiguous arrays.
+    `idx_order` is kept as an index array; a batch of consecutive ascending indices is a zero-copy slice.
+    `data_list` may also be a dict of equally long arrays, giving dict batches.
+    '''
+    def __init__(
+        self,
+        data_list: Union[_ArrayLike, Dict[str, _ArrayLike]],
+        batch_size: int,
+        idx_order: Optional[Sequence[int]] = None,
+    ):
+        self.data_list = data_list
+        self.batch_size = batch_size
+        num_data = len(self._fields()[0])
+        for arr in self._fields():
+            if len(arr) != num_data:
+                raise ValueError(f"Field lengths differ: {[len(arr) for arr in self._fields()]}")
+        self.idx_order = np.arange(num_data) if (idx_order is None) else np.asarray(idx_order, dtype=np.int64)
+
+    def __len__(self):
+        return (len(self._fields()[0]) + self.batch_size - 1) // self.batch_size
+
+    def iter_idxs_grps(self) -> Iterable[np.ndarray]:
+        return (self.idx_order[st:st + self.batch_size] for st in range(0, len(self.idx_order), self.batch_size))
+
+    def get_batch(self, idxs: np.ndarray):
+        if isinstance(self.data_list, dict):
+            return {key: _gather(arr, idxs) for key, arr in self.data_list.items()}
+        return _gather(self.data_list, idxs)
+
+    def _fields(self):
+        return list(self.data_list.values()) if isinstance(self.data_list, dict) else [self.data_list]
+
+
+def _gather(arr: _ArrayLike, idxs: np.ndarray) -> np.ndarray:
+    idxs = np.asarray(idxs)
+    if len(idxs) > 0 and idxs[-1] - idxs[0] == len(idxs) - 1 and np.all(np.diff(idxs) == 1):
+        return arr[int(idxs[0]):int(idxs[-1]) + 1]
+    if isinstance(arr, ShardedArray):
+        return arr.take(idxs)
+    # gathering in ascending order turns random access on a memmap into forward reads
+    order = np.argsort(idxs, kind="stable")
+    out = np.empty((len(idxs), *arr.shape[1:]), dtype=arr.dtype)
+    out[order] = arr[idxs[order]]
+    return out
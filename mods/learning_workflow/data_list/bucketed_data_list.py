@@ -0,0 +1,110 @@
+import numpy as np
+
+from .data_list import DataList
+
+from typing import Sequence, List, Optional, Iterable, Tuple
+
+
+class BucketedDataList(DataList):
+    '''
+    `DataList` over variable-length sequences (e.g. (L_i, 2) trajs) that batches indices of similar length together.
+    Indices of `idx_order` are put into buckets by length; every iteration shuffles within each bucket,
+    cuts the buckets into batches and shuffles the batch order, so an epoch still visits every index once.
+    Batches are `(padded, mask)`, with `padded` of shape (B, L_max, ...) and `mask` (B, L_max) `True` on real steps.
+    Buckets are computed once per `idx_order` object: assign a new `idx_order` rather than editing it in place.
+    '''
+    def __init__(
+        self,
+        data_list: Sequence[np.ndarray],
+        batch_size: int,
+        bucket_bounds: Sequence[int],
+        lengths: Optional[Sequence[int]] = None,
+        idx_order: Optional[List[int]] = None,
+        shuffle: bool = True,
+        seed: Optional[int] = None,
+        pad_value: float = 0.0,
+    ):
+        '''
+        @param: bucket_bounds
+            ascending inclusive upper lengths of the buckets; longer sequences go to one extra last bucket
+        @param: lengths
+            length of every item of `data_list`, `len(item)` if not given
+        '''
+        super().__init__(data_list, batch_size, idx_order)
+        bucket_bounds = np.asarray(bucket_bounds, dtype=np.int64)
+        if np.any(np.diff(bucket_bounds) <= 0):
+            raise ValueError(f"bucket_bounds must be ascending: {bucket_bounds}")
+        self.bucket_bounds = bucket_bounds
+        self.lengths = np.asarray(
+            [len(item) for item in data_list] if (lengths is None) else lengths, dtype=np.int64,
+        )
+        if len(self.lengths) != len(data_list):
+            raise ValueError(f"{len(self.lengths)=}, {len(data_list)=}")
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.pad_value = pad_value
+        self._cached_idx_order = None
+        self._cached_buckets: List[np.ndarray] = []
+        self._cached_len = 0
+
+    def __len__(self):
+        self._buckets()
+        return self._cached_len
+
+    def iter_idxs_grps(self) -> Iterable[List[int]]:
+        grps = []
+        for bucket in self._buckets():
+            if self.shuffle:
+                bucket = self.rng.permutation(bucket)
+            grps.extend(bucket[st:st + self.batch_size].tolist() for st in range(0, len(bucket), self.batch_size))
+        if self.shuffle:
+            grps = [grps[i] for i in self.rng.permutation(len(grps))]
+        return grps
+
+    def get_batch(self, idxs: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        lengths = self.lengths[idxs]
+        first = np.asarray(self.data_list[idxs[0]])
+        padded = np.full((len(idxs), int(lengths.max()), *first.shape[1:]), self.pad_value, dtype=first.dtype)
+        for row, idx in enumerate(idxs):
+            padded[row, :lengths[row]] = self.data_list[idx]
+        mask = np.arange(padded.shape[1]) < lengths[:, None]
+        return padded, mask
+
+    def bucket_sizes(self) -> np.ndarray:
+        '''
+        @return: number of indices in every bucket, the last one being the overflow bucket
+        '''
+        return np.array([len(bucket) for bucket in self._buckets()])
+
+    def padding_efficiency(self, idxs_grps: Optional[Iterable[List[int]]] = None) -> float:
+        '''
+        Fraction of padded steps that are real, over one epoch of batches (a fresh grouping if not given).
+        Compare with `batch_size` groups of a plain `DataList` to see what the bucket bounds buy.
+        '''
+        idxs_grps = self.iter_idxs_grps() if (idxs_grps is None) else idxs_grps
+        num_real = num_padded = 0
+        for idxs in idxs_grps:
+            lengths = self.lengths[idxs]
+            num_real += int(lengths.sum())
+            num_padded += len(idxs) * int(lengths.max())
+        return num_real / max(num_padded, 1)
+
+    def _buckets(self) -> List[np.ndarray]:
+        if self._cached_idx_order is not self.idx_order:
+            idx_order = np.asarray(self.idx_order, dtype=np.int64)
+            bucket_idxs = np.searchsorted(self.bucket_bounds, self.lengths[idx_order], side="left")
+            # one stable sort instead of a mask per bucket; keeps `idx_order` order within each bucket
+            order = np.argsort(bucket_idxs, kind="stable")
+            counts = np.bincount(bucket_idxs, minlength=len(self.bucket_bounds) + 1)
+            self._cached_buckets = np.split(idx_order[order], np.cumsum(counts)[:-1])
+            self._cached_len = int(sum((count + self.batch_size - 1) // self.batch_size for count in counts.tolist()))
+            self._cached_idx_order = self.idx_order
+        return self._cached_buckets
+
+
+def quantile_bucket_bounds(lengths: Sequence[int], num_buckets: int) -> List[int]:
+    '''
+    Bucket bounds holding about the same number of sequences each, a starting point for tuning.
+    '''
+    qs = np.quantile(np.asarray(lengths), np.linspace(0.0, 1.0, num_buckets + 1)[1:])
+    return sorted(set(np.ceil(qs).astype(np.int64).tolist()))
@@ -1,6 +1,6 @@
 import math
 
-from typing import Sequence, List, Optional, Iterable
+from typing import Sequence, List, Optional, Iterable, Any
 
 
 def _regroup_by_group_size(itr: Sequence, group_size: int):
@@ -16,17 +16,29 @@ def _regroup_by_group_size(itr: Sequence, group_size: int):
 
 
 class DataList:
+    # True if batches are drawn while iterating (e.g. `ReplayBuffer`) instead of being fixed by `iter_idxs_grps`
+    # up front; a checkpointing `Pipeline` then does not materialize the epoch, and resumes with fresh draws
+    sampled = False
+
     def __init__(self, data_list: Sequence, batch_size: int, idx_order: Optional[List[int]] = None):
         self.data_list = data_list
         self.batch_size = batch_size
         self.idx_order = idx_order if (idx_order is not None) else list(range(len(data_list)))
     
     def __iter__(self):
-        idxs_grp: Iterable[List[int]] = _regroup_by_group_size(self.idx_order, self.batch_size)
-        return (
-            [self.data_list[idx] for idx in idxs]
-            for idxs in idxs_grp
-        )
+        return self.iter_batches(self.iter_idxs_grps())
+
+    def iter_batches(self, idxs_grps: Iterable[List[int]]) -> Iterable[Any]:
+        '''
+        Batches of the given index groups, e.g. the groups left of an epoch when resuming from a checkpoint.
+        '''
+        return (self.get_batch(idxs) for idxs in idxs_grps)
+
+    def iter_idxs_grps(self) -> Iterable[List[int]]:
+        return _regroup_by_group_size(self.idx_order, self.batch_size)
+
+    def get_batch(self, idxs: List[int]) -> Any:
+        return [self.data_list[idx] for idx in idxs]
 
     def __len__(self):
         return math.ceil(len(self.data_list) / self.batch_size)
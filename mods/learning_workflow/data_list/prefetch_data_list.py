@@ -0,0 +1,142 @@
+from collections import deque
+from concurrent.futures import Executor as _PoolExecutor, Future, ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+from .data_list import DataList
+
+from typing import Any, Callable, Deque, Iterable, List, Optional
+
+
+class PrefetchDataList(DataList):
+    '''
+    Wraps a `DataList` so that up to `num_prefetch` batches are built by background workers
+    while the caller consumes earlier ones. Batches are still yielded in `idx_order`.
+    The workers are started by the first iteration and reused by the next ones until `close`
+    (or the end of a `with` block).
+    '''
+    def __init__(
+        self,
+        data_list: DataList,
+        num_prefetch: int = 2,
+        num_workers: int = 1,
+        use_processes: bool = False,
+        collate_fn: Optional[Callable[[Any], Any]] = None,
+    ):
+        '''
+        @param: use_processes
+            build batches in worker processes (`data_list` and `collate_fn` must be picklable; sent once per worker,
+            so later changes to them need a `close` first)
+        @param: collate_fn
+            applied to each batch of `data_list` inside the worker
+        '''
+        if num_prefetch < 1 or num_workers < 1:
+            raise ValueError(f"{num_prefetch=}, {num_workers=}")
+        self.inner = data_list
+        self.num_prefetch = num_prefetch
+        self.num_workers = num_workers
+        self.use_processes = use_processes
+        self.collate_fn = collate_fn
+        self._in_flight: Deque[Future] = deque()
+        self._pool: Optional[_PoolExecutor] = None
+
+    @property
+    def data_list(self):
+        return self.inner.data_list
+
+    @property
+    def batch_size(self):
+        return self.inner.batch_size
+
+    @property
+    def idx_order(self):
+        return self.inner.idx_order
+
+    def __len__(self):
+        return len(self.inner)
+
+    def iter_batches(self, idxs_grps: Iterable[List[int]]):
+        pool = self._get_pool()
+        fetch = _get_batch_in_worker if self.use_processes else self.get_batch
+        idxs_grps = iter(idxs_grps)
+        in_flight: Deque[Future] = deque()
+        self._in_flight = in_flight
+
+        def submit_next():
+            idxs = next(idxs_grps, None)
+            if idxs is not None:
+                in_flight.append(pool.submit(fetch, idxs))
+
+        try:
+            for _ in range(self.num_prefetch):
+                submit_next()
+            while len(in_flight) > 0:
+                batch = in_flight.popleft().result()
+                submit_next()
+                yield batch
+        finally:
+            # also reached when the consumer raises or stops early (generator close)
+            for future in in_flight:
+                future.cancel()
+            # batches already being built are waited for, so none spills over into the next iteration
+            wait(in_flight)
+            in_flight.clear()
+
+    def iter_idxs_grps(self) -> Iterable[List[int]]:
+        return self.inner.iter_idxs_grps()
+
+    def get_batch(self, idxs: List[int]) -> Any:
+        batch = self.inner.get_batch(idxs)
+        return batch if (self.collate_fn is None) else self.collate_fn(batch)
+
+    def qsize(self) -> int:
+        '''
+        Number of batches already built and waiting to be consumed.
+        '''
+        return sum(future.done() for future in list(self._in_flight))
+
+    def close(self):
+        '''
+        Stop the workers; the next iteration starts new ones.
+        '''
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __getstate__(self):
+        # a copy (e.g. inside a pickled executor) starts its own workers
+        state = self.__dict__.copy()
+        state.update(_pool=None, _in_flight=deque())
+        return state
+
+    def _get_pool(self) -> _PoolExecutor:
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(
+                    self.num_workers, initializer=_init_worker, initargs=(self.inner, self.collate_fn),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(self.num_workers, thread_name_prefix="prefetch")
+        return self._pool
+
+
+# worker process side
+_worker_data_list: Optional[DataList] = None
+_worker_collate_fn: Optional[Callable[[Any], Any]] = None
+
+
+def _init_worker(data_list: DataList, collate_fn: Optional[Callable[[Any], Any]]):
+    global _worker_data_list, _worker_collate_fn
+    _worker_data_list = data_list
+    _worker_collate_fn = collate_fn
+
+
+def _get_batch_in_worker(idxs: List[int]) -> Any:
+    if _worker_data_list is None:
+        raise RuntimeError("Worker not initialized!")
+    batch = _worker_data_list.get_batch(idxs)
+    return batch if (_worker_collate_fn is None) else _worker_collate_fn(batch)
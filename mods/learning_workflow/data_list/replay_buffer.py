@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+
+from .data_list import DataList
+from .array_data_list import _gather
+
+from typing import Any, Dict, Iterable, Optional
+
+
+class SumTree:
+    '''
+    Binary tree over `capacity` non-negative priorities keeping the sum and the min of every subtree,
+    for O(log N) proportional sampling. Updates and lookups are vectorized over whole batches.
+    '''
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.num_leaves = 1 << max(capacity - 1, 1).bit_length()  # at least 2, so the root is no leaf
+        self.sums = np.zeros(2 * self.num_leaves, dtype=np.float64)
+        self.mins = np.full(2 * self.num_leaves, np.inf, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.sums[1])
+
+    @property
+    def min(self) -> float:
+        return float(self.mins[1])
+
+    def __getitem__(self, idxs: np.ndarray) -> np.ndarray:
+        return self.sums[np.asarray(idxs) + self.num_leaves]
+
+    def update(self, idxs: np.ndarray, priorities: np.ndarray):
+        '''
+        Set the priorities of leaves `idxs`; with duplicated indices the last one wins.
+        Every ancestor is recomputed from its children once, so float errors never accumulate.
+        '''
+        nodes = np.asarray(idxs, dtype=np.int64) + self.num_leaves
+        if len(nodes) == 0:
+            return
+        self.sums[nodes] = priorities
+        self.mins[nodes] = priorities
+        nodes = np.unique(nodes >> 1)
+        while True:
+            left = nodes << 1
+            self.sums[nodes] = self.sums[left] + self.sums[left + 1]
+            self.mins[nodes] = np.minimum(self.mins[left], self.mins[left + 1])
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes >> 1)
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        '''
+        @return: for each value in [0, total), the leaf whose prefix-sum range contains it
+        '''
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.num_leaves:  # all nodes are at the same depth
+            left = nodes << 1
+            left_sums = self.sums[left]
+            go_right = values >= left_sums
+            values -= np.where(go_right, left_sums, 0.0)
+            nodes = left + go_right
+        # float rounding may step past the last leaf; past other empty leaves too, which callers clamp
+        return np.minimum(nodes - self.num_leaves, self.capacity - 1)
+
+
+class ReplayBuffer(DataList):
+    '''
+    Fixed-capacity ring buffer of experience rows with prioritized sampling (Schaul et al., 2016).
+    Fields are preallocated arrays, created from the row shapes / dtypes of the first `add`,
+    e.g. the dict returned by `games.simple_traj_game.collect_rollouts`; with `spill_dir` they are .npy memmaps
+    there instead, so the buffer may exceed RAM.
+    As a `DataList`, an epoch is `batches_per_epoch` batches sampled with probability p_i^alpha / sum_k p_k^alpha;
+    every batch is a dict of the fields plus "idxs" (for `update_priorities`) and "weights", the normalized
+    importance-sampling weights (N * P(i))^-beta / max_j (N * P(j))^-beta.
+    '''
+    RESERVED_KEYS = ("idxs", "weights")
+    sampled = True
+
+    def __init__(
+        self,
+        capacity: int,
+        batch_size: int,
+        batches_per_epoch: int,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        eps: float = 1e-6,
+        spill_dir: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        '''
+        @param: alpha
+            how much prioritization is used, 0 for uniform sampling
+        @param: beta
+            importance-sampling correction, 1 for full; may be annealed by setting the attribute
+        @param: eps
+            added to `|priority|` so no row becomes unreachable
+        @param: spill_dir
+            directory of the memmapped fields, `None` to keep them in memory
+        '''
+        if (capacity < 1) or (batch_size < 1) or (batches_per_epoch < 1):
+            raise ValueError(f"{capacity=}, {batch_size=}, {batches_per_epoch=}")
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.batches_per_epoch = batches_per_epoch
+        self.alpha = alpha
+        self.beta = beta
+        self.eps = eps
+        self.spill_dir = spill_dir
+        self.rng = np.random.default_rng(seed)
+
+        self.data_list: Dict[str, np.ndarray] = {}  # allocated by the first `add`
+        self.idx_order = None  # batches are sampled, not ordered
+        self.tree = SumTree(capacity)
+        self.size = 0
+        self.pos = 0  # next row to write
+        self.max_priority = 1.0  # of `tree`, i.e. after `alpha`; given to new rows
+
+    def __len__(self):
+        return self.batches_per_epoch
+
+    def add(self, rows: Dict[str, np.ndarray], priorities: Optional[np.ndarray] = None) -> np.ndarray:
+        '''
+        Append rows, overwriting the oldest ones once full.
+        @param: priorities
+            raw priorities (e.g. |TD error|) of the rows, the highest seen so far by default
+        @return: the buffer indices written, aligned with `rows`
+        '''
+        for key in self.RESERVED_KEYS:
+            if key in rows:
+                raise KeyError(f"{key!r} is reserved for sampled batches")
+        num_rows = len(next(iter(rows.values())))
+        for key, arr in rows.items():
+            if len(arr) != num_rows:
+                raise ValueError(f"Field lengths differ: {({key: len(arr) for key, arr in rows.items()})}")
+        if not self.data_list:
+            self._allocate(rows)
+        elif rows.keys() != self.data_list.keys():
+            raise KeyError(f"{sorted(rows)} != {sorted(self.data_list)}")
+
+        # only the last `capacity` rows of an oversized add survive
+        skip = max(num_rows - self.capacity, 0)
+        idxs = (self.pos + np.arange(skip, num_rows)) % self.capacity
+        for key, arr in rows.items():
+            self.data_list[key][idxs] = arr[skip:]
+        if priorities is None:
+            self.tree.update(idxs, np.full(len(idxs), self.max_priority))
+        else:
+            self.update_priorities(idxs, np.asarray(priorities)[skip:])
+
+        self.pos = (self.pos + num_rows) % self.capacity
+        self.size = min(self.size + num_rows, self.capacity)
+        return idxs
+
+    def update_priorities(self, idxs: np.ndarray, priorities: np.ndarray):
+        '''
+        Batched update, e.g. with the |TD errors| of a sampled batch's "idxs".
+        '''
+        ps = (np.abs(np.asarray(priorities, dtype=np.float64)) + self.eps) ** self.alpha
+        self.tree.update(idxs, ps)
+        if len(ps) > 0:
+            self.max_priority = max(self.max_priority, float(ps.max()))
+
+    def sample_idxs(self, num: int) -> np.ndarray:
+        '''
+        Stratified: one draw from each of `num` equal slices of the total priority, which lowers variance.
+        '''
+        if self.size == 0:
+            raise ValueError("Sampling from an empty replay buffer!")
+        total = self.tree.total
+        values = (np.arange(num) + self.rng.random(num)) * (total / num)
+        # rows fill [0, size) before the ring wraps, and float rounding may step into the empty leaves past it
+        return np.minimum(self.tree.find(values), self.size - 1)
+
+    def iter_idxs_grps(self) -> Iterable[np.ndarray]:
+        # sampled lazily, so priorities updated during the epoch count for its later batches
+        return (self.sample_idxs(self.batch_size) for _ in range(self.batches_per_epoch))
+
+    def get_batch(self, idxs: np.ndarray) -> Dict[str, np.ndarray]:
+        idxs = np.asarray(idxs, dtype=np.int64)
+        batch = {key: _gather(arr, idxs) for key, arr in self.data_list.items()}
+        # max weight belongs to the smallest priority, so the weights are (p_min / p_i)^beta
+        batch["weights"] = (self.tree.min / self.tree[idxs]) ** self.beta
+        batch["idxs"] = idxs
+        return batch
+
+    def flush(self):
+        for arr in self.data_list.values():
+            if isinstance(arr, np.memmap):
+                arr.flush()
+
+    def state_dict(self) -> Dict[str, Any]:
+        '''
+        For the owning `Executor.state_dict`; copies the stored rows, memmapped ones included.
+        '''
+        return {
+            "data": {key: np.array(arr[:self.size]) for key, arr in self.data_list.items()},
+            "priorities": self.tree[np.arange(self.size)],
+            "size": self.size,
+            "pos": self.pos,
+            "max_priority": self.max_priority,
+            "rng": self.rng.bit_generator.state,
+        }
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.data_list = {}
+        self.tree = SumTree(self.capacity)
+        if state["data"]:
+            self._allocate(state["data"])
+            for key, arr in state["data"].items():
+                self.data_list[key][:len(arr)] = arr
+        self.tree.update(np.arange(state["size"]), state["priorities"])
+        self.size = state["size"]
+        self.pos = state["pos"]
+        self.max_priority = state["max_priority"]
+        self.rng.bit_generator.state = state["rng"]
+
+    def _allocate(self, rows: Dict[str, np.ndarray]):
+        for key, arr in rows.items():
+            arr = np.asarray(arr)
+            shape = (self.capacity, *arr.shape[1:])
+            if self.spill_dir is None:
+                self.data_list[key] = np.zeros(shape, dtype=arr.dtype)
+            else:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self.data_list[key] = np.lib.format.open_memmap(
+                    os.path.join(self.spill_dir, f"{key}.npy"), mode="w+", dtype=arr.dtype, shape=shape,
+                )
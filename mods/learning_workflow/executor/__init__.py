@@ -1,2 +1,3 @@
 from .executor import Executor
 from .dummy_executor import DummyExecutor
+from .actor_learner_executor import ActorLearnerExecutor
@@ -0,0 +1,195 @@
+import pickle
+import queue
+import multiprocessing as mp
+from abc import abstractmethod
+
+import numpy as np
+
+from ..data_list import DataList
+from .executor import Executor
+
+from typing import Any, Callable, Dict, List, Optional
+
+
+# (policy, rng) -> one experience batch; must be a picklable module-level function
+ActorFn = Callable[[Any, np.random.Generator], Any]
+
+
+class ActorLearnerExecutor(Executor):
+    '''
+    On-policy `Executor`: `num_actors` processes keep producing experience batches with `actor_fn` on the latest
+    policy snapshot they received, while `train_forward` / `step` run on the main process.
+    Subclasses implement `get_policy_snapshot` and `learn` (plus `train_forward` and the eval methods);
+    `step` calls `learn` and publishes a new snapshot every `publish_every` steps.
+    A batch made with a policy more than `max_policy_lag` versions behind the learner is discarded.
+    '''
+    def __init__(
+        self,
+        actor_fn: ActorFn,
+        num_actors: int,
+        batches_per_epoch: int,
+        max_policy_lag: int = 1,
+        publish_every: int = 1,
+        max_queue: Optional[int] = None,
+        seed: int = 0,
+        mp_context: Optional[str] = None,
+    ):
+        '''
+        @param: max_queue
+            experience batches buffered ahead of the learner, `num_actors` by default
+        '''
+        if (num_actors < 1) or (batches_per_epoch < 1) or (max_policy_lag < 0) or (publish_every < 1):
+            raise ValueError(f"{num_actors=}, {batches_per_epoch=}, {max_policy_lag=}, {publish_every=}")
+        self.actor_fn = actor_fn
+        self.num_actors = num_actors
+        self.batches_per_epoch = batches_per_epoch
+        self.max_policy_lag = max_policy_lag
+        self.publish_every = publish_every
+        self.max_queue = max_queue if (max_queue is not None) else num_actors
+        self.seed = seed
+        self.mp_context = mp_context
+
+        self.policy_version = 0
+        self.num_steps = 0
+        self.num_stale = 0  # discarded batches
+        self._ctx = mp.get_context(mp_context)
+        self._actors: List[mp.Process] = []
+        self._policy_qs: List[Any] = []
+        self._exp_q: Optional[Any] = None
+        self._stop: Optional[Any] = None
+
+    @abstractmethod
+    def get_policy_snapshot(self) -> Any:
+        '''
+        Picklable policy handed to `actor_fn`, e.g. a copy of the weights on CPU.
+        '''
+        pass
+
+    @abstractmethod
+    def learn(self, data: Any, forward_ret: Any):
+        pass
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {"policy_version": self.policy_version, "num_steps": self.num_steps}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        self.policy_version = state["policy_version"]
+        self.num_steps = state["num_steps"]
+        if self._actors:
+            self.publish_policy()
+
+    def get_train_datas(self) -> DataList:
+        if not self._actors:
+            self._start_actors()
+        return _ExperienceDataList(self, self.batches_per_epoch)
+
+    def step(self, data: Any, forward_ret: Any):
+        self.learn(data, forward_ret)
+        self.num_steps += 1
+        if self.num_steps % self.publish_every == 0:
+            self.policy_version += 1
+            self.publish_policy()
+
+    def publish_policy(self):
+        # pickled once for all actors
+        blob = pickle.dumps((self.policy_version, self.get_policy_snapshot()), protocol=pickle.HIGHEST_PROTOCOL)
+        for policy_q in self._policy_qs:
+            policy_q.put(blob)
+
+    def next_experience(self) -> Any:
+        '''
+        Next experience batch recent enough for the current policy; blocks until an actor delivers one.
+        '''
+        while True:
+            version, batch = self._exp_q.get()
+            if self.policy_version - version <= self.max_policy_lag:
+                return batch
+            self.num_stale += 1
+
+    def close(self):
+        if not self._actors:
+            return
+        self._stop.set()
+        # actors blocked on a full queue only notice the stop once there is room
+        for actor in self._actors:
+            while actor.is_alive():
+                _drain(self._exp_q)
+                actor.join(timeout=0.05)
+        for q in [*self._policy_qs, self._exp_q]:
+            # unread snapshots are dropped instead of waiting for a reader that is gone
+            q.cancel_join_thread()
+            q.close()
+        self._actors = []
+        self._policy_qs = []
+
+    def __getstate__(self):
+        # a copy (e.g. for an eval worker) starts its own actors
+        state = self.__dict__.copy()
+        state.update(_ctx=None, _actors=[], _policy_qs=[], _exp_q=None, _stop=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._ctx = mp.get_context(self.mp_context)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _start_actors(self):
+        self._stop = self._ctx.Event()
+        self._exp_q = self._ctx.Queue(self.max_queue)
+        self._policy_qs = [self._ctx.Queue() for _ in range(self.num_actors)]
+        self.publish_policy()
+        self._actors = [
+            self._ctx.Process(
+                target=_actor_main,
+                args=(self.actor_fn, [self.seed, actor_idx], self._policy_qs[actor_idx], self._exp_q, self._stop),
+                name=f"actor-{actor_idx}",
+                daemon=True,
+            )
+            for actor_idx in range(self.num_actors)
+        ]
+        for actor in self._actors:
+            actor.start()
+
+
+class _ExperienceDataList(DataList):
+    '''
+    One epoch of `num_batches` streamed batches; indices only count them.
+    '''
+    def __init__(self, executor: ActorLearnerExecutor, num_batches: int):
+        super().__init__(range(num_batches), batch_size=1)
+        self.executor = executor
+
+    def get_batch(self, idxs: List[int]) -> Any:
+        return self.executor.next_experience()
+
+
+def _actor_main(actor_fn: ActorFn, seed: List[int], policy_q: Any, exp_q: Any, stop: Any):
+    rng = np.random.default_rng(seed)
+    version, policy = pickle.loads(policy_q.get())
+    while not stop.is_set():
+        # skip to the newest snapshot
+        while True:
+            try:
+                version, policy = pickle.loads(policy_q.get_nowait())
+            except queue.Empty:
+                break
+        batch = actor_fn(policy, rng)
+        while not stop.is_set():
+            try:
+                exp_q.put((version, batch), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+
+
+def _drain(q: Any):
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 
 from ..data_list import DataList
 
-from typing import Any
+from typing import Any, Dict
 
 
 class Executor(ABC):
@@ -25,3 +25,15 @@ class Executor(ABC):
     @abstractmethod
     def eval_forward(self, data: Any) -> Any:
         pass
+
+    def state_dict(self) -> Dict[str, Any]:
+        '''
+        State to checkpoint (model, optimizer, private rngs, ...). The pipeline deep-copies it on the training thread
+        before writing it in the background, so returning live objects is fine.
+        It is also what a scheduled eval in a subprocess (`Cfg.eval_in_subprocess`) loads into the worker's copy of the
+        executor, pickled once; while it stays empty, the whole executor is pickled again for every eval instead.
+        '''
+        return {}
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        pass
@@ -0,0 +1,39 @@
+"""
+Worker process side of the scheduled evaluations of `Pipeline`.
+"""
+
+import pickle
+
+from ..executor import Executor
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+_executor: Optional[Executor] = None
+
+
+def init_eval_worker(executor_blob: bytes):
+    # unpickled rather than inherited through fork, so executors drop their process-bound handles in `__getstate__`
+    global _executor
+    _executor = pickle.loads(executor_blob)
+
+
+def eval_snapshot(
+    state: Dict[str, Any], return_batches: bool, executor_blob: Optional[bytes] = None,
+) -> List[Tuple[Any, Any]]:
+    '''
+    @param: return_batches
+        send the data batches back too, else `None` in their place (they may be the whole eval set)
+    @param: executor_blob
+        the pickled executor replacing the worker's one, for executors with an empty `state_dict`
+    @return: (data_batch, eval_forward ret) of every eval batch, with the executor in `state`
+    '''
+    if executor_blob is not None:
+        init_eval_worker(executor_blob)
+    if _executor is None:
+        raise RuntimeError("Worker not initialized!")
+    _executor.load_state_dict(state)
+    return [
+        (data_batch if return_batches else None, _executor.eval_forward(data_batch))
+        for data_batch in _executor.get_eval_datas()
+    ]
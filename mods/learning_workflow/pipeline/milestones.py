@@ -4,6 +4,8 @@ from enum import StrEnum
 class Milestones(StrEnum):
     TR_ST       = "train_start"
     TR_EP_ST    = "train_epoch_start"
+    TR_DATA_ST  = "train_data_start"
+    TR_DATA_EN  = "train_data_end"
     TR_IT_ST    = "train_iter_start"
     TR_BEF_STEP = "train_before_step"
     TR_IT_EN    = "train_iter_end"
@@ -11,6 +13,8 @@ class Milestones(StrEnum):
     TR_EN       = "train_end"
 
     EV_ST       = "eval_start"
+    EV_DATA_ST  = "eval_data_start"
+    EV_DATA_EN  = "eval_data_end"
     EV_IT_ST    = "eval_iter_start"
     EV_IT_EN    = "eval_iter_end"
     EV_EN       = "eval_end"
@@ -1,17 +1,31 @@
+import copy
+import pickle
+import itertools
 import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import replace
 
 from .milestones import Milestones
+from .eval_worker import init_eval_worker, eval_snapshot
 from ..data_cls import Cfg, PipelineStatus
 from ..executor import Executor
 from ..data_list import DataList
-from ..recaller import Recaller
+from ..recaller import Recaller, Schedule
 from ..widgets import WidgetsBase
+from ..checkpoint import Checkpointer, get_rng_states, set_rng_states
+
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+_NO_BATCH = object()
 
 
 class Pipeline:
-    def __init__(self, cfg: Cfg, executor: Executor):
+    def __init__(self, cfg: Cfg, executor: Executor, checkpointer: Optional[Checkpointer] = None):
         self.cfg = cfg
         self.executor = executor
+        self.checkpointer = checkpointer
         self.recaller = Recaller(list(Milestones))
 
         self.status = PipelineStatus(
@@ -22,30 +36,45 @@ class Pipeline:
             total_its=-1,
             start_time=-1.0,
         )
+        self.train_data_list: Optional[DataList] = None  # of the running train epoch, e.g. for widgets' threads
+        self._eval_pool: Optional[ProcessPoolExecutor] = None
+        self._pending_evals: Deque[Tuple[int, Future]] = deque()  # (ep_idx, future of `eval_snapshot`)
     
-    def register(self, widget: WidgetsBase):
-        if widget.on_train_start is not WidgetsBase.on_train_start:
+    def register(self, widget: WidgetsBase, schedule: Optional[Schedule] = None):
+        """
+        schedule: when the iteration callbacks (train/eval iter start, before step, iter end) fire, default every iteration
+        """
+        if widget.overrides("on_train_start"):
             self.recaller.register(Milestones.TR_ST, widget.on_train_start)
-        if widget.on_train_epoch_start is not WidgetsBase.on_train_epoch_start:
+        if widget.overrides("on_train_epoch_start"):
             self.recaller.register(Milestones.TR_EP_ST, widget.on_train_epoch_start)
-        if widget.on_train_iter_start is not WidgetsBase.on_train_iter_start:
-            self.recaller.register(Milestones.TR_IT_ST, widget.on_train_iter_start)
-        if widget.on_train_before_step is not WidgetsBase.on_train_before_step:
-            self.recaller.register(Milestones.TR_BEF_STEP, widget.on_train_before_step)
-        if widget.on_train_iter_end is not WidgetsBase.on_train_iter_end:
-            self.recaller.register(Milestones.TR_IT_EN, widget.on_train_iter_end)
-        if widget.on_train_epoch_end is not WidgetsBase.on_train_epoch_end:
+        if widget.overrides("on_train_data_start"):
+            self.recaller.register(Milestones.TR_DATA_ST, widget.on_train_data_start, schedule)
+        if widget.overrides("on_train_data_end"):
+            self.recaller.register(Milestones.TR_DATA_EN, widget.on_train_data_end, schedule)
+        if widget.overrides("on_train_iter_start"):
+            self.recaller.register(Milestones.TR_IT_ST, widget.on_train_iter_start, schedule)
+        if widget.overrides("on_train_before_step"):
+            self.recaller.register(Milestones.TR_BEF_STEP, widget.on_train_before_step, schedule)
+        if widget.overrides("on_train_iter_end"):
+            self.recaller.register(Milestones.TR_IT_EN, widget.on_train_iter_end, schedule)
+        if widget.overrides("on_train_epoch_end"):
             self.recaller.register(Milestones.TR_EP_EN, widget.on_train_epoch_end)
-        if widget.on_train_end is not WidgetsBase.on_train_end:
+        if widget.overrides("on_train_end"):
             self.recaller.register(Milestones.TR_EN, widget.on_train_end)
-        if widget.on_eval_start is not WidgetsBase.on_eval_start:
+        if widget.overrides("on_eval_start"):
             self.recaller.register(Milestones.EV_ST, widget.on_eval_start)
-        if widget.on_eval_iter_start is not WidgetsBase.on_eval_iter_start:
-            self.recaller.register(Milestones.EV_IT_ST, widget.on_eval_iter_start)
-        if widget.on_eval_iter_end is not WidgetsBase.on_eval_iter_end:
-            self.recaller.register(Milestones.EV_IT_EN, widget.on_eval_iter_end)
-        if widget.on_eval_end is not WidgetsBase.on_eval_end:
+        if widget.overrides("on_eval_data_start"):
+            self.recaller.register(Milestones.EV_DATA_ST, widget.on_eval_data_start, schedule)
+        if widget.overrides("on_eval_data_end"):
+            self.recaller.register(Milestones.EV_DATA_EN, widget.on_eval_data_end, schedule)
+        if widget.overrides("on_eval_iter_start"):
+            self.recaller.register(Milestones.EV_IT_ST, widget.on_eval_iter_start, schedule)
+        if widget.overrides("on_eval_iter_end"):
+            self.recaller.register(Milestones.EV_IT_EN, widget.on_eval_iter_end, schedule)
+        if widget.overrides("on_eval_end"):
             self.recaller.register(Milestones.EV_EN, widget.on_eval_end)
+        widget.attach(self)
 
     def train(self, start_ep_idx: int, end_ep_idx: int):
         """
@@ -53,36 +82,210 @@ class Pipeline:
         end_ep: inclusive
         """
 
+        self._train(start_ep_idx, end_ep_idx)
+
+    def resume(self, end_ep_idx: int):
+        """
+        Continue from the latest checkpoint of `self.checkpointer`, right after its last finished iteration,
+        or train from epoch 0 if there is none.
+        end_ep: inclusive
+        """
+        if self.checkpointer is None:
+            raise RuntimeError("No checkpointer given!")
+        ckpt = self.checkpointer.load_latest()
+        if ckpt is None:
+            self._train(0, end_ep_idx)
+            return
+
+        self.executor.load_state_dict(ckpt["executor"])
+        if ckpt["epoch_done"]:
+            set_rng_states(ckpt["rng"])
+            if ckpt["ep_idx"] < end_ep_idx:
+                self._train(ckpt["ep_idx"] + 1, end_ep_idx)
+            return
+        # the executor rebuilds the data list (possibly drawing from the rngs), then the rng states are put back;
+        # the interrupted epoch goes on over its recorded index groups, not a fresh shuffle
+        data_list = self.executor.get_train_datas()
+        set_rng_states(ckpt["rng"])
+        self._train(ckpt["ep_idx"], end_ep_idx, (data_list, ckpt["idxs_grps"], ckpt["it_idx"] + 1))
+
+    def _train(self, start_ep_idx: int, end_ep_idx: int, resume_from: Optional[tuple] = None):
+        """
+        resume_from: (data_list, idxs_grps, first it_idx) of a partly done first epoch
+        """
         if (start_ep_idx < 0) or (end_ep_idx > (self.cfg.total_train_epoch - 1)):
             raise ValueError(f"{start_ep_idx=}, {end_ep_idx=}, total_epoch={self.cfg.total_train_epoch}")
 
+        # looked up once, so that milestones nobody listens to cost a branch per iteration
+        recaller = self.recaller
+        has_schedules = len(recaller.schedules) > 0
+        has_data = recaller.has_listeners(Milestones.TR_DATA_ST) or recaller.has_listeners(Milestones.TR_DATA_EN)
+        has_it_st = recaller.has_listeners(Milestones.TR_IT_ST)
+        has_bef_step = recaller.has_listeners(Milestones.TR_BEF_STEP)
+        has_it_en = recaller.has_listeners(Milestones.TR_IT_EN)
+
         self._update_status_on_train_start(start_ep_idx, end_ep_idx)
         self.recaller.trigger(Milestones.TR_ST, self.cfg, self.status)
-        for ep_idx in range(start_ep_idx, end_ep_idx + 1):
-            self._update_status_on_train_epoch_start(ep_idx)
-            self.recaller.trigger(Milestones.TR_EP_ST, self.cfg, self.status)
-            data_list: DataList = self.executor.get_train_datas()
-            for it_idx, data_batch in enumerate(data_list):
-                self._update_status_on_iter_start(it_idx, len(data_list))
-                self.recaller.trigger(Milestones.TR_IT_ST, self.cfg, self.status, data_batch)
-                ret = self.executor.train_forward(data_batch)
-                self.recaller.trigger(Milestones.TR_BEF_STEP, self.cfg, self.status, data_batch, ret)
-                self.executor.step(data_batch, ret)
-                self.recaller.trigger(Milestones.TR_IT_EN, self.cfg, self.status, data_batch, ret)
-            self.recaller.trigger(Milestones.TR_EP_EN, self.cfg, self.status)
+        try:
+            for ep_idx in range(start_ep_idx, end_ep_idx + 1):
+                self._update_status_on_train_epoch_start(ep_idx)
+                self.recaller.trigger(Milestones.TR_EP_ST, self.cfg, self.status)
+                if resume_from is not None:
+                    data_list, idxs_grps, start_it_idx = resume_from
+                    resume_from = None
+                else:
+                    data_list: DataList = self.executor.get_train_datas()
+                    # materialized, so that a checkpoint can record exactly which batches are left
+                    idxs_grps = None
+                    if (self.checkpointer is not None) and not data_list.sampled:
+                        idxs_grps = list(data_list.iter_idxs_grps())
+                    start_it_idx = 0
+                self.train_data_list = data_list
+                total_its = len(data_list)
+                if idxs_grps is not None:
+                    batches = data_list.iter_batches(idxs_grps[start_it_idx:])
+                elif start_it_idx > 0:
+                    # resumed epoch of a sampled data list: only as many fresh draws as batches were left
+                    batches = data_list.iter_batches(
+                        itertools.islice(data_list.iter_idxs_grps(), total_its - start_it_idx)
+                    )
+                else:
+                    batches = iter(data_list)
+                if has_data:
+                    batches = self._iter_with_data_milestones(
+                        batches, start_it_idx, total_its, Milestones.TR_DATA_ST, Milestones.TR_DATA_EN,
+                    )
+                for it_idx, data_batch in enumerate(batches, start=start_it_idx):
+                    self._update_status_on_iter_start(it_idx, total_its)
+                    if has_schedules and not has_data:
+                        # otherwise already done before the data milestones of this iteration
+                        recaller.update_schedules(it_idx, total_its)
+                    if has_it_st:
+                        recaller.trigger(Milestones.TR_IT_ST, self.cfg, self.status, data_batch)
+                    ret = self.executor.train_forward(data_batch)
+                    if has_bef_step:
+                        recaller.trigger(Milestones.TR_BEF_STEP, self.cfg, self.status, data_batch, ret)
+                    self.executor.step(data_batch, ret)
+                    if has_it_en:
+                        recaller.trigger(Milestones.TR_IT_EN, self.cfg, self.status, data_batch, ret)
+                    if (
+                        (self.checkpointer is not None) and (it_idx < total_its - 1)
+                        and self.checkpointer.should_save(ep_idx, it_idx, total_its)
+                    ):
+                        self._save_checkpoint(ep_idx, it_idx, False, idxs_grps)
+                    if self._pending_evals:
+                        self._deliver_evals(wait=False)
+                self.recaller.trigger(Milestones.TR_EP_EN, self.cfg, self.status)
+                if (self.checkpointer is not None) and self.checkpointer.should_save(ep_idx, total_its - 1, total_its):
+                    self._save_checkpoint(ep_idx, total_its - 1, True, idxs_grps)
+                if (self.cfg.eval_every_n_epochs is not None) and ((ep_idx + 1) % self.cfg.eval_every_n_epochs == 0):
+                    self._start_scheduled_eval(ep_idx)
+            self._deliver_evals(wait=True)
+        finally:
+            self.train_data_list = None
+            # also on errors, so that the next `train` neither reuses the eval worker nor replays stale results
+            self.close()
         self.recaller.trigger(Milestones.TR_EN, self.cfg, self.status)
+        if self.checkpointer is not None:
+            self.checkpointer.flush()
 
     def eval(self):
         self._update_status_on_eval_start()
         self.recaller.trigger(Milestones.EV_ST, self.cfg, self.status)
-        data_list: DataList = self.executor.get_train_datas()
-        for it_idx, data_batch in enumerate(data_list):
+        data_list: DataList = self.executor.get_eval_datas()
+        batches = self._iter_with_data_milestones(data_list, 0, len(data_list), Milestones.EV_DATA_ST, Milestones.EV_DATA_EN)
+        for it_idx, data_batch in enumerate(batches):
             self._update_status_on_iter_start(it_idx, len(data_list))
             self.recaller.trigger(Milestones.EV_IT_ST, self.cfg, self.status, data_batch)
             ret = self.executor.eval_forward(data_batch)
             self.recaller.trigger(Milestones.EV_IT_EN, self.cfg, self.status, data_batch, ret)
         self.recaller.trigger(Milestones.EV_EN, self.cfg, self.status)
 
+    def close(self):
+        '''
+        Stop the eval worker, if any; `train` starts a new one when needed.
+        '''
+        for _, future in self._pending_evals:
+            future.cancel()
+        self._pending_evals.clear()
+        if self._eval_pool is not None:
+            self._eval_pool.shutdown(wait=True, cancel_futures=True)
+            self._eval_pool = None
+
+    def _start_scheduled_eval(self, ep_idx: int):
+        if not self.cfg.eval_in_subprocess:
+            # on a copy of the status, so that the train start time (and ETA) survives
+            train_status = self.status
+            self.status = replace(train_status)
+            try:
+                self.eval()
+            finally:
+                self.status = train_status
+            return
+        # copied on the training thread, which goes on mutating the executor
+        state = copy.deepcopy(self.executor.state_dict())
+        # without a state to load, the worker's copy would stay the one of the first eval: send the whole executor
+        executor_blob = None if state else pickle.dumps(self.executor, protocol=pickle.HIGHEST_PROTOCOL)
+        if self._eval_pool is None:
+            init_blob = executor_blob or pickle.dumps(self.executor, protocol=pickle.HIGHEST_PROTOCOL)
+            self._eval_pool = ProcessPoolExecutor(1, initializer=init_eval_worker, initargs=(init_blob,))
+        future = self._eval_pool.submit(eval_snapshot, state, self.cfg.eval_return_batches, executor_blob)
+        self._pending_evals.append((ep_idx, future))
+
+    def _deliver_evals(self, wait: bool):
+        '''
+        Replay the EV_* milestones of finished scheduled evals, in submission order, on the training thread,
+        in the same order as `eval`; the data milestones come back to back, the batches being already fetched.
+        '''
+        while self._pending_evals and (wait or self._pending_evals[0][1].done()):
+            ep_idx, future = self._pending_evals.popleft()
+            results = future.result()
+            total_its = len(results)
+            status = replace(self.status, current_ep_idx=ep_idx, current_it_idx=-1, total_its=total_its)
+            self.recaller.trigger(Milestones.EV_ST, self.cfg, status)
+            for it_idx, (data_batch, ret) in enumerate(results):
+                status.current_it_idx = it_idx
+                self.recaller.update_schedules(it_idx, total_its)
+                self.recaller.trigger(Milestones.EV_DATA_ST, self.cfg, status)
+                self.recaller.trigger(Milestones.EV_DATA_EN, self.cfg, status, data_batch)
+                self.recaller.trigger(Milestones.EV_IT_ST, self.cfg, status, data_batch)
+                self.recaller.trigger(Milestones.EV_IT_EN, self.cfg, status, data_batch, ret)
+            # like `eval`, whose last data start finds no batch left
+            status.current_it_idx = total_its
+            self.recaller.update_schedules(total_its, total_its)
+            self.recaller.trigger(Milestones.EV_DATA_ST, self.cfg, status)
+            self.recaller.trigger(Milestones.EV_EN, self.cfg, status)
+
+    def _iter_with_data_milestones(
+        self, batches: Iterable[Any], start_it_idx: int, total_its: int, st_key: Milestones, en_key: Milestones,
+    ) -> Iterable[Any]:
+        # brackets the fetch of every batch; the last start has no end when the batches run out.
+        # Schedules are updated here, before the first milestone of the iteration, so that all of its milestones agree
+        batch_itr = iter(batches)
+        has_schedules = len(self.recaller.schedules) > 0
+        for it_idx in itertools.count(start_it_idx):
+            self._update_status_on_iter_start(it_idx, total_its)
+            if has_schedules:
+                self.recaller.update_schedules(it_idx, total_its)
+            self.recaller.trigger(st_key, self.cfg, self.status)
+            data_batch = next(batch_itr, _NO_BATCH)
+            if data_batch is _NO_BATCH:
+                return
+            self.recaller.trigger(en_key, self.cfg, self.status, data_batch)
+            yield data_batch
+
+    def _save_checkpoint(self, ep_idx: int, it_idx: int, epoch_done: bool, idxs_grps: Optional[List]):
+        # copied here on the training thread; pickling and writing happen on the checkpointer's thread
+        snapshot: Dict[str, Any] = {
+            "ep_idx": ep_idx,
+            "it_idx": it_idx,
+            "epoch_done": epoch_done,
+            "executor": copy.deepcopy(self.executor.state_dict()),
+            "rng": get_rng_states(),
+            "idxs_grps": idxs_grps,  # built once per epoch and never mutated, `None` for sampled data lists
+        }
+        self.checkpointer.save(ep_idx, it_idx, epoch_done, snapshot)
+
     def _update_status_on_train_start(self, start_ep_idx: int, end_ep_idx: int):
         self.status.start_ep_idx = start_ep_idx
         self.status.end_ep_idx = end_ep_idx
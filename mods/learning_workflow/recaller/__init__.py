@@ -1 +1,2 @@
 from .recaller import Recaller
+from .schedule import Schedule
@@ -1,13 +1,74 @@
-from typing import List, Hashable, Callable
+import time
+
+from .schedule import Schedule
+
+from typing import Any, Dict, List, Hashable, Callable, Optional, Tuple
 
 
 class Recaller:
     def __init__(self, allowed_keys: List[Hashable]):
         self.fns = {key: [] for key in allowed_keys}
+        self.fn_schedules: Dict[Hashable, List[Optional[Schedule]]] = {key: [] for key in allowed_keys}
+        self.schedules: List[Schedule] = []
+        # per key, the tuple actually looped over by `trigger`; only rebuilt when registering or a schedule flips
+        self.calls: Dict[Hashable, Tuple[Callable[..., None], ...]] = {key: () for key in allowed_keys}
+        self.timer: Optional[Any] = None
 
-    def register(self, key: Hashable, fn: Callable[..., None]):
+    def register(self, key: Hashable, fn: Callable[..., None], schedule: Optional[Schedule] = None):
+        if (schedule is not None) and schedule.always:
+            schedule = None
+        if (schedule is not None) and all(schedule is not known for known in self.schedules):
+            self.schedules.append(schedule)
         self.fns[key].append(fn)
-    
+        self.fn_schedules[key].append(schedule)
+        self._compile(key)
+
+    def has_listeners(self, key: Hashable) -> bool:
+        return (self.timer is not None) or (len(self.fns[key]) > 0)
+
+    def set_timer(self, timer: Optional[Any]):
+        '''
+        @param: timer
+            gets `on_trigger(key, st_ns, fns, ens_ns)` after every trigger (also of milestones without callbacks),
+            callback `fns[i]` having run until `ens_ns[i]` and the trigger from `st_ns` to `ens_ns[-1]`;
+            `None` to stop timing
+        '''
+        self.timer = timer
+        if timer is None:
+            self.__dict__.pop("trigger", None)
+        else:
+            # shadows the untimed `trigger`, which thus pays nothing for this feature
+            self.trigger = self._trigger_timed
+
+    def update_schedules(self, it_idx: int, total_its: int):
+        '''
+        Decide which scheduled callbacks fire during iteration `it_idx`.
+        '''
+        changed = False
+        for schedule in self.schedules:
+            was_active = schedule.active
+            schedule.update(it_idx, total_its)
+            changed |= (schedule.active != was_active)
+        if changed:
+            for key, fn_schedules in self.fn_schedules.items():
+                if any(schedule is not None for schedule in fn_schedules):
+                    self._compile(key)
+
     def trigger(self, key: Hashable, *args, **kwargs):
-        for fn in self.fns[key]:
+        for fn in self.calls[key]:
+            fn(*args, **kwargs)
+
+    def _trigger_timed(self, key: Hashable, *args, **kwargs):
+        calls = self.calls[key]
+        ens = []
+        st = time.perf_counter_ns()
+        # one clock read per callback: each one starts where the previous ended
+        for fn in calls:
             fn(*args, **kwargs)
+            ens.append(time.perf_counter_ns())
+        self.timer.on_trigger(key, st, calls, ens)
+
+    def _compile(self, key: Hashable):
+        self.calls[key] = tuple(
+            fn for fn, schedule in zip(self.fns[key], self.fn_schedules[key]) if (schedule is None) or schedule.active
+        )
@@ -0,0 +1,41 @@
+import time
+
+from typing import Optional
+
+
+class Schedule:
+    '''
+    When a widget's iteration callbacks fire. Conditions are OR-ed; with none given, every iteration fires.
+    Evaluated once per iteration (`update`), so all milestones of one iteration agree.
+    '''
+    def __init__(
+        self,
+        every_n_iters: Optional[int] = None,
+        every_n_seconds: Optional[float] = None,
+        first_iter: bool = False,
+        last_iter: bool = False,
+    ):
+        if (every_n_iters is not None) and (every_n_iters < 1):
+            raise ValueError(f"{every_n_iters=}")
+        self.every_n_iters = every_n_iters
+        self.every_n_seconds = every_n_seconds
+        self.first_iter = first_iter
+        self.last_iter = last_iter
+        self.always = (every_n_iters is None) and (every_n_seconds is None) and not (first_iter or last_iter)
+        self.active = True
+        self._last_fire_time = -float("inf")
+
+    def update(self, it_idx: int, total_its: int):
+        if self.always:
+            return
+        active = (
+            (self.first_iter and it_idx == 0)
+            or (self.last_iter and it_idx == total_its - 1)
+            or ((self.every_n_iters is not None) and (it_idx % self.every_n_iters == 0))
+        )
+        if self.every_n_seconds is not None:
+            now = time.perf_counter()
+            if active or (now - self._last_fire_time) >= self.every_n_seconds:
+                active = True
+                self._last_fire_time = now
+        self.active = active
@@ -1,2 +1,3 @@
 from .widgets_base import WidgetsBase
+from .async_widget import AsyncWidget, Backpressure
 from .the_widgets import *
@@ -0,0 +1,170 @@
+import threading
+from collections import deque
+from dataclasses import replace
+from enum import StrEnum
+
+from .widgets_base import WidgetsBase
+from ..data_cls import Cfg, PipelineStatus
+
+from typing import Any, Callable, Deque, Optional, Tuple
+
+
+class Backpressure(StrEnum):
+    BLOCK    = "block"     # the training loop waits for room
+    DROP     = "drop"      # the new event is discarded
+    COALESCE = "coalesce"  # the oldest queued event of the same callback is replaced by the new one
+
+
+# only these may be dropped or coalesced; start/end events are always delivered
+_ITER_CALLBACKS = frozenset([
+    "on_train_data_start", "on_train_data_end", "on_eval_data_start", "on_eval_data_end",
+    "on_train_iter_start", "on_train_before_step", "on_train_iter_end", "on_eval_iter_start", "on_eval_iter_end",
+])
+_FLUSH_CALLBACKS = frozenset(["on_train_end", "on_eval_end"])
+
+
+class AsyncWidget(WidgetsBase):
+    '''
+    Runs the callbacks of `widget` on a background thread, fed by a bounded queue.
+    Callbacks get a copy of `PipelineStatus` taken when the event happened, and `select_fn(data_batch, forward_ret)`
+    instead of the live batch and outputs (nothing by default), so the training loop may go on mutating them.
+    `on_train_end` / `on_eval_end` return only once every queued event has been handled.
+    '''
+    def __init__(
+        self,
+        widget: WidgetsBase,
+        max_queue: int = 64,
+        backpressure: Backpressure = Backpressure.BLOCK,
+        select_fn: Optional[Callable[[Any, Any], Tuple[Any, Any]]] = None,
+    ):
+        '''
+        @param: select_fn
+            (data_batch, forward_ret) -> what the callbacks receive instead; must copy whatever it keeps
+        '''
+        if max_queue < 1:
+            raise ValueError(f"{max_queue=}")
+        self.widget = widget
+        self.max_queue = max_queue
+        self.backpressure = Backpressure(backpressure)
+        self.select_fn = select_fn if (select_fn is not None) else _select_nothing
+        self.num_dropped = 0
+
+        self._queue: Deque[Tuple[str, tuple]] = deque()
+        self._cond = threading.Condition()
+        self._num_unfinished = 0
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def overrides(self, callback_name: str) -> bool:
+        # the end callbacks are where the queue gets flushed, so they are always registered
+        return (callback_name in _FLUSH_CALLBACKS) or self.widget.overrides(callback_name)
+
+    def attach(self, pipeline: Any):
+        # on the registering thread: e.g. `Telemetry` and `Profiler` hook into the pipeline here
+        self.widget.attach(pipeline)
+
+    def on_train_start(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_train_start", (cfg, replace(status)))
+
+    def on_train_epoch_start(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_train_epoch_start", (cfg, replace(status)))
+
+    def on_train_data_start(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_train_data_start", (cfg, replace(status)))
+
+    def on_train_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._put("on_train_data_end", (cfg, replace(status), self.select_fn(data_batch, None)[0]))
+
+    def on_train_iter_start(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._put("on_train_iter_start", (cfg, replace(status), self.select_fn(data_batch, None)[0]))
+
+    def on_train_before_step(self, cfg: Cfg, status: PipelineStatus, data_batch: Any, forward_ret: Any):
+        self._put("on_train_before_step", (cfg, replace(status), *self.select_fn(data_batch, forward_ret)))
+
+    def on_train_iter_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any, forward_ret: Any):
+        self._put("on_train_iter_end", (cfg, replace(status), *self.select_fn(data_batch, forward_ret)))
+
+    def on_train_epoch_end(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_train_epoch_end", (cfg, replace(status)))
+
+    def on_train_end(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_train_end", (cfg, replace(status)))
+
+    def on_eval_start(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_eval_start", (cfg, replace(status)))
+
+    def on_eval_data_start(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_eval_data_start", (cfg, replace(status)))
+
+    def on_eval_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._put("on_eval_data_end", (cfg, replace(status), self.select_fn(data_batch, None)[0]))
+
+    def on_eval_iter_start(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._put("on_eval_iter_start", (cfg, replace(status), self.select_fn(data_batch, None)[0]))
+
+    def on_eval_iter_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any, forward_ret: Any):
+        self._put("on_eval_iter_end", (cfg, replace(status), *self.select_fn(data_batch, forward_ret)))
+
+    def on_eval_end(self, cfg: Cfg, status: PipelineStatus):
+        self._put("on_eval_end", (cfg, replace(status)))
+
+    def qsize(self) -> int:
+        return len(self._queue)
+
+    def flush(self):
+        '''
+        Wait until every queued event has been handled, re-raising a callback's error if any.
+        '''
+        with self._cond:
+            self._cond.wait_for(lambda: (self._num_unfinished == 0) or (self._error is not None))
+        self._raise_error()
+
+    def _put(self, callback_name: str, args: tuple):
+        self._raise_error()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"async-{type(self.widget).__name__}", daemon=True)
+            self._thread.start()
+        with self._cond:
+            if (len(self._queue) >= self.max_queue) and (callback_name in _ITER_CALLBACKS):
+                if self.backpressure == Backpressure.DROP:
+                    self.num_dropped += 1
+                    return
+                if self.backpressure == Backpressure.COALESCE:
+                    for i, (queued_name, _) in enumerate(self._queue):
+                        if queued_name == callback_name:
+                            del self._queue[i]
+                            self._num_unfinished -= 1
+                            self.num_dropped += 1
+                            break
+                self._cond.wait_for(lambda: (len(self._queue) < self.max_queue) or (self._error is not None))
+            self._queue.append((callback_name, args))
+            self._num_unfinished += 1
+            self._cond.notify_all()
+        if callback_name in _FLUSH_CALLBACKS:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._queue) > 0)
+                callback_name, args = self._queue.popleft()
+                self._cond.notify_all()
+            try:
+                if self.widget.overrides(callback_name):
+                    getattr(self.widget, callback_name)(*args)
+            except BaseException as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._num_unfinished -= 1
+                self._cond.notify_all()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Async {type(self.widget).__name__} failed") from self._error
+
+
+def _select_nothing(data_batch: Any, forward_ret: Any) -> Tuple[Any, Any]:
+    return None, None
@@ -1 +1,3 @@
 from .eta_verboser import EtaVerboser
+from .profiler import Profiler
+from .telemetry import Telemetry, load_telemetry_log
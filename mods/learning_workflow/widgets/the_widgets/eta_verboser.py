@@ -1,16 +1,17 @@
 import time
 
-from tqdm import tqdm
-
 from ..widgets_base import WidgetsBase
 from ...data_cls import Cfg, PipelineStatus
 
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from tqdm import tqdm
 
 
 class EtaVerboser(WidgetsBase):
     def __init__(self, extra_verbose_fn: Optional[Callable[[Cfg, PipelineStatus], str]] = None):
-        self.iter_tqdm: Optional[tqdm] = None
+        self.iter_tqdm: Optional["tqdm"] = None
         self.extra_verbosing_fn = extra_verbose_fn
     
     def on_train_epoch_start(self, cfg: Cfg, status: PipelineStatus):
@@ -23,8 +24,10 @@ class EtaVerboser(WidgetsBase):
         print(f"[Epoch {status.current_ep_idx+1}/{cfg.total_train_epoch}] {vbs_str}")
     
     def on_train_iter_start(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
-        if status.current_it_idx == 0:
-            self.iter_tqdm = tqdm(total=status.total_its)
+        if (status.current_it_idx == 0) or (self.iter_tqdm is None):
+            # `iter_tqdm` is still None when resuming in the middle of an epoch
+            from tqdm import tqdm  # only the main process needs it
+            self.iter_tqdm = tqdm(total=status.total_its, initial=status.current_it_idx)
     
     def on_train_iter_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any, forward_ret: Any):
         if self.iter_tqdm is None:
@@ -35,6 +38,7 @@ class EtaVerboser(WidgetsBase):
         if self.iter_tqdm is None:
             raise RuntimeError
         self.iter_tqdm.close()
+        self.iter_tqdm = None
     
     @staticmethod
     def _format_dur(dur: float):
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from ..widgets_base import WidgetsBase
+from ...data_cls import Cfg, PipelineStatus
+
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+
+# (previous milestone, milestone) -> the phase running between them
+_PHASES = {
+    ("train_data_start", "train_data_end"): "data",
+    ("train_iter_start", "train_before_step"): "forward",
+    ("train_before_step", "train_iter_end"): "step",
+    ("train_iter_end", "train_data_start"): "between_iters",
+    ("eval_data_start", "eval_data_end"): "eval_data",
+    ("eval_iter_start", "eval_iter_end"): "eval_forward",
+}
+_ITER_START_KEYS = frozenset(["train_data_start", "eval_data_start"])
+_ITER_END_KEYS = frozenset(["train_iter_end", "eval_iter_end"])
+
+_TID_PHASES = 0
+_TID_WIDGETS = 1
+
+
+class Profiler(WidgetsBase):
+    '''
+    Times every phase of an iteration (data fetch, forward, step, between iterations) and every callback of the
+    other widgets, keeping rolling windows of durations for percentiles / histograms plus samples/s.
+    Hooks into the pipeline's `Recaller`, so register it before training starts.
+    Optionally records a Chrome / Perfetto trace (chrome://tracing, ui.perfetto.dev).
+    '''
+    def __init__(
+        self,
+        window: int = 1000,
+        batch_size_fn: Optional[Callable[[Any], int]] = None,
+        trace_path: Optional[str] = None,
+        max_trace_events: int = 1_000_000,
+        print_report: bool = True,
+    ):
+        '''
+        @param: window
+            number of latest durations kept per phase / widget
+        @param: batch_size_fn
+            number of samples in a data batch; by default the length of a list batch, or the leading dimension of
+            an array batch or of the first array of a tuple / dict batch (e.g. `BucketedDataList`, `ReplayBuffer`)
+        @param: trace_path
+            where to write the trace at train end, `None` to not record one
+        '''
+        self.window = window
+        self.batch_size_fn = batch_size_fn if (batch_size_fn is not None) else _batch_size
+        self.trace_path = trace_path
+        self.max_trace_events = max_trace_events
+        self.print_report = print_report
+
+        self.durs: Dict[str, Deque[int]] = {}
+        self.counts: Dict[str, int] = {}
+        self.samples: Deque[Tuple[int, int]] = deque(maxlen=window)  # (iter end ns, num samples)
+        self.trace_events: List[Dict[str, Any]] = []
+
+        self._callback_names: Dict[Any, Optional[str]] = {}
+        self._last_key: Optional[Hashable] = None
+        self._last_en = 0
+        self._iter_st: Optional[int] = None  # `None` outside of an iteration
+        self._num_batch_samples = 0
+        self._t0 = time.perf_counter_ns()
+
+    def attach(self, pipeline: Any):
+        pipeline.recaller.set_timer(self)
+
+    # called by the recaller
+    def on_trigger(self, key: Hashable, st: int, fns: Tuple[Callable[..., None], ...], ens: List[int]):
+        en = ens[-1] if ens else st
+        phase = _PHASES.get((self._last_key, key))
+        if phase is not None:
+            self._record(phase, self._last_en, st, _TID_PHASES)
+        if key in _ITER_START_KEYS:
+            self._iter_st = st
+        elif (key in _ITER_END_KEYS) and (self._iter_st is not None):
+            # replayed evals (`Cfg.eval_in_subprocess`) have no data milestones, hence no iteration start
+            self._record("iter", self._iter_st, en, _TID_PHASES)
+            self.samples.append((en, self._num_batch_samples))
+            self._iter_st = None
+
+        fn_st = st
+        for fn, fn_en in zip(fns, ens):
+            name = self._callback_names.get(fn, "")
+            if name == "":
+                owner = getattr(fn, "__self__", fn)
+                name = self._callback_names[fn] = None if (owner is self) else f"widget:{type(owner).__name__}"
+            if name is not None:
+                self._record(name, fn_st, fn_en, _TID_WIDGETS, key)
+            fn_st = fn_en
+
+        self._last_key = key
+        self._last_en = en
+
+    # milestone callbacks
+    def on_train_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._num_batch_samples = self.batch_size_fn(data_batch)
+
+    def on_eval_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        self._num_batch_samples = self.batch_size_fn(data_batch)
+
+    def on_train_end(self, cfg: Cfg, status: PipelineStatus):
+        if self.trace_path is not None:
+            self.export_chrome_trace(self.trace_path)
+        if self.print_report:
+            print(self.report())
+
+    # queries
+    def throughput(self) -> float:
+        '''
+        @return: samples/s over the window
+        '''
+        if len(self.samples) < 2:
+            return 0.0
+        dur = (self.samples[-1][0] - self.samples[0][0]) / 1e9
+        return sum(n for _, n in list(self.samples)[1:]) / max(dur, 1e-9)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        '''
+        @return: per phase / widget, total count and window statistics in ms
+        '''
+        stats = {}
+        for name, durs in self.durs.items():
+            ms = np.asarray(durs, dtype=np.float64) / 1e6
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            stats[name] = {
+                "count": self.counts[name], "mean": float(ms.mean()),
+                "p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(ms.max()),
+            }
+        return stats
+
+    def histogram(self, name: str, bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        @return: (counts, bin edges in ms) of the window of `name`
+        '''
+        return np.histogram(np.asarray(self.durs[name], dtype=np.float64) / 1e6, bins=bins)
+
+    def report(self) -> str:
+        lines = [f"{'phase':<32} {'count':>8} {'mean(ms)':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        for name, st in self.summary().items():
+            lines.append(
+                f"{name:<32} {st['count']:>8} {st['mean']:>9.3f} {st['p50']:>9.3f} "
+                f"{st['p90']:>9.3f} {st['p99']:>9.3f} {st['max']:>9.3f}"
+            )
+        lines.append(f"throughput: {self.throughput():.1f} samples/s")
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str):
+        pid = os.getpid()
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in [(_TID_PHASES, "phases"), (_TID_WIDGETS, "widgets")]
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + [dict(event, pid=pid) for event in self.trace_events]}, f)
+
+    def _record(self, name: str, st: int, en: int, tid: int, key: Optional[Hashable] = None):
+        durs = self.durs.get(name)
+        if durs is None:
+            durs = self.durs[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+        durs.append(en - st)
+        self.counts[name] += 1
+        if (self.trace_path is not None) and (len(self.trace_events) < self.max_trace_events):
+            event = {"name": name, "ph": "X", "ts": (st - self._t0) / 1e3, "dur": (en - st) / 1e3, "tid": tid}
+            if key is not None:
+                event["args"] = {"milestone": str(key)}
+            self.trace_events.append(event)
+
+
+def _batch_size(data_batch: Any) -> int:
+    if data_batch is None:
+        return 0
+    if isinstance(data_batch, dict):
+        return _batch_size(next(iter(data_batch.values()))) if data_batch else 0
+    if isinstance(data_batch, tuple):
+        return _batch_size(data_batch[0]) if data_batch else 0
+    shape = getattr(data_batch, "shape", None)
+    if shape is not None:
+        return shape[0] if len(shape) > 0 else 1
+    return len(data_batch)
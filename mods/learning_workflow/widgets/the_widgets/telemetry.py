@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import struct
+import warnings
+import threading
+import tracemalloc
+
+import numpy as np
+
+from ..widgets_base import WidgetsBase
+from ...data_cls import Cfg, PipelineStatus
+from ...data_list import DataList
+
+from typing import Any, Callable, List, Optional, Tuple
+
+
+_LOG_MAGIC = b"TLMY"
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class Telemetry(WidgetsBase):
+    '''
+    Samples resource usage on a background thread every `interval` seconds while training:
+    process RSS, tracemalloc peak, utilization of every CPU core and the data-loader queue depth.
+    `extra_verbose` summarizes the samples since its last call, for `EtaVerboser(extra_verbose_fn=...)`;
+    raw samples optionally go to a binary log, read back by `load_telemetry_log`.
+    '''
+    def __init__(
+        self,
+        interval: float = 0.5,
+        log_path: Optional[str] = None,
+        trace_malloc: bool = False,
+        queue_depth_fn: Optional[Callable[[DataList], int]] = None,
+    ):
+        '''
+        @param: trace_malloc
+            start `tracemalloc` during training (slows allocations down) to report the peak of Python allocations
+        @param: queue_depth_fn
+            queue depth of the data list of the running train epoch (a new one every epoch),
+            e.g. `PrefetchDataList.qsize`
+        '''
+        self.interval = interval
+        self.log_path = log_path
+        self.trace_malloc = trace_malloc
+        self.queue_depth_fn = queue_depth_fn
+
+        self.num_cores = len(_read_cpu_times())
+        self.dtype = np.dtype([
+            ("time", np.float64),
+            ("rss", np.int64),
+            ("malloc_peak", np.int64),
+            ("queue_depth", np.int32),
+            ("cpu", np.float32, (self.num_cores,)),
+        ])
+        self.samples: List[np.void] = []  # since the last `extra_verbose`
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+        self._pipeline: Optional[Any] = None
+        self._queue_depth_failed = False
+
+    def attach(self, pipeline: Any):
+        self._pipeline = pipeline
+
+    def on_train_start(self, cfg: Cfg, status: PipelineStatus):
+        if self.trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._queue_depth_failed = False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def on_train_end(self, cfg: Cfg, status: PipelineStatus):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def extra_verbose(self, cfg: Cfg, status: PipelineStatus) -> str:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        if len(samples) == 0:
+            return "telemetry: no sample yet"
+        samples = np.array(samples, dtype=self.dtype)
+        parts = [f"rss: {samples['rss'][-1] / 1024**3:.2f}G (max {samples['rss'].max() / 1024**3:.2f}G)"]
+        if self.num_cores > 0:
+            cpu = samples["cpu"].mean(axis=0)
+            parts.append(f"cpu: {cpu.mean() * 100:.0f}% avg, {cpu.max() * 100:.0f}% busiest of {self.num_cores}")
+        if samples["malloc_peak"][-1] >= 0:
+            parts.append(f"malloc peak: {samples['malloc_peak'].max() / 1024**2:.1f}M")
+        if samples["queue_depth"][-1] >= 0:
+            parts.append(f"queue: {samples['queue_depth'].mean():.1f}")
+        cuda_mem = _cuda_mem_str()
+        if cuda_mem is not None:
+            parts.append(cuda_mem)
+        return " | ".join(parts)
+
+    def _queue_depth(self) -> int:
+        data_list = None if (self._pipeline is None) else self._pipeline.train_data_list
+        if (self.queue_depth_fn is None) or (data_list is None):
+            return -1
+        try:
+            return self.queue_depth_fn(data_list)
+        except Exception as e:
+            # e.g. a data list without a queue; must not kill the sampling thread
+            if not self._queue_depth_failed:
+                self._queue_depth_failed = True
+                warnings.warn(f"Telemetry: queue_depth_fn failed on {type(data_list).__name__}: {e!r}", RuntimeWarning)
+            return -1
+
+    def _run(self):
+        log = None if (self.log_path is None) else open(self.log_path, "wb")
+        try:
+            if log is not None:
+                header = json.dumps({"descr": self.dtype.descr}).encode()
+                log.write(_LOG_MAGIC + struct.pack("<I", len(header)) + header)
+            prev_cpu_times = _read_cpu_times()
+            while not self._stop.wait(self.interval):
+                cpu_times = _read_cpu_times()
+                sample = np.zeros((), dtype=self.dtype)
+                sample["time"] = time.time()
+                sample["rss"] = _read_rss()
+                sample["malloc_peak"] = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else -1
+                sample["queue_depth"] = self._queue_depth()
+                sample["cpu"] = _cpu_utilization(prev_cpu_times, cpu_times)
+                prev_cpu_times = cpu_times
+                with self._lock:
+                    self.samples.append(sample)
+                if log is not None:
+                    log.write(sample.tobytes())
+        finally:
+            if log is not None:
+                log.close()
+
+
+def load_telemetry_log(path: str) -> np.ndarray:
+    '''
+    @return: the structured samples written by `Telemetry(log_path=path)`
+    '''
+    with open(path, "rb") as f:
+        if f.read(len(_LOG_MAGIC)) != _LOG_MAGIC:
+            raise ValueError(f"{path} is not a telemetry log")
+        header_len, = struct.unpack("<I", f.read(4))
+        descr = json.loads(f.read(header_len))["descr"]
+        dtype = np.dtype([tuple(field) for field in descr])
+        return np.fromfile(f, dtype=dtype)
+
+
+def _read_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        # peak rather than current, the best available without /proc
+        scale = 1 if (sys.platform == "darwin") else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _read_cpu_times() -> List[Tuple[int, int]]:
+    '''
+    @return: (busy, total) jiffies of every core, empty without /proc/stat
+    '''
+    try:
+        with open("/proc/stat") as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    times = []
+    for line in lines:
+        if line.startswith("cpu") and line[3].isdigit():
+            # user nice system idle iowait irq softirq steal; guest and guest_nice are already in user and nice
+            vals = [int(v) for v in line.split()[1:9]]
+            idle = vals[3] + (vals[4] if len(vals) > 4 else 0)  # idle + iowait
+            times.append((sum(vals) - idle, sum(vals)))
+    return times
+
+
+def _cpu_utilization(prev: List[Tuple[int, int]], curr: List[Tuple[int, int]]) -> np.ndarray:
+    busy = np.array([c[0] - p[0] for p, c in zip(prev, curr)], dtype=np.float32)
+    total = np.array([c[1] - p[1] for p, c in zip(prev, curr)], dtype=np.float32)
+    return busy / np.maximum(total, 1.0)
+
+
+def _cuda_mem_str() -> Optional[str]:
+    # only if the program already uses torch; never imported here
+    torch = sys.modules.get("torch")
+    if (torch is None) or not torch.cuda.is_available():
+        return None
+    mem_alc = torch.cuda.max_memory_allocated() / (1024 ** 3)
+    mem_total = torch.cuda.get_device_properties(0).total_memory / (1024 ** 3)
+    return f"cuda mem: {mem_alc:.1f}/{mem_total:.1f}G({mem_alc / mem_total * 100:.1f}%)"
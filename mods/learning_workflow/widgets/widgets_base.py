@@ -4,12 +4,37 @@ from typing import Any
 
 
 class WidgetsBase:
+    def overrides(self, callback_name: str) -> bool:
+        '''
+        Whether this widget implements `callback_name`; the pipeline only registers those.
+        '''
+        return getattr(type(self), callback_name) is not getattr(WidgetsBase, callback_name)
+
+    def attach(self, pipeline: Any):
+        '''
+        Called by `Pipeline.register`, for widgets that need more than the milestone callbacks.
+        '''
+        pass
+
+    def as_async(self, **kwargs) -> "WidgetsBase":
+        '''
+        This widget running on a background thread, see `AsyncWidget` for `kwargs`.
+        '''
+        from .async_widget import AsyncWidget
+        return AsyncWidget(self, **kwargs)
+
     def on_train_start(self, cfg: Cfg, status: PipelineStatus):
         pass
 
     def on_train_epoch_start(self, cfg: Cfg, status: PipelineStatus):
         pass
 
+    def on_train_data_start(self, cfg: Cfg, status: PipelineStatus):
+        pass
+
+    def on_train_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        pass
+
     def on_train_iter_start(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
         pass
 
@@ -28,6 +53,12 @@ class WidgetsBase:
     def on_eval_start(self, cfg: Cfg, status: PipelineStatus):
         pass
 
+    def on_eval_data_start(self, cfg: Cfg, status: PipelineStatus):
+        pass
+
+    def on_eval_data_end(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
+        pass
+
     def on_eval_iter_start(self, cfg: Cfg, status: PipelineStatus, data_batch: Any):
         pass
 